@@ -1,21 +1,32 @@
 import streamlit as st
 import pandas as pd
 import sqlite3
-from datetime import datetime, timedelta, date
+import json
+from contextlib import closing
+from datetime import date
+from html import escape
 from streamlit_option_menu import option_menu
 
+from piscina import bd
+from piscina.alumnos import actualizar_contacto, buscar_alumnos, eliminar_alumno_total
+from piscina.asistencia import asistencia_salon, diff_asistencia, guardar_asistencia
+from piscina.bd import UMBRAL_N1, ArchivoBD, ConflictoEdicion, get_perfil, get_pool
+from piscina.ciclos import (agregar_feriado, archivar_ciclo, crear_ciclo, fechas_clase, listar_ciclos,
+                            listar_feriados, purgar_ciclo, quitar_feriado)
+from piscina.config import ARCHIVO_DB, CLASES_META, DIAS, HORAS, NIVELES
+from piscina.esquema import init_db
+from piscina.horarios import crear_salon, eliminar_salones, ocupacion_salones, salones_en_fecha
+from piscina.importacion import COLUMNAS_IMPORT, importar_alumnos, leer_archivo_alumnos
+from piscina.incidentes import GRAVEDADES, PAGINA_INCIDENTES, historial_incidentes, registrar_incidente
+from piscina.matriculas import matricular, matricular_alumno_nuevo, resumen_matriculas
+from piscina.recuperaciones import (PAGINA_PENDIENTES, agendar_recuperaciones, calendario_recuperaciones, marcar_visitantes,
+                                    pendientes_recuperacion, planificar_recuperaciones, visitantes_salon)
+from piscina.reportes import FORMATOS, REPORTES, bloques_consulta, generar_reporte
+
 # ==========================================
 # 0. CONFIGURACIÓN GENERAL
 # ==========================================
 st.set_page_config(page_title="Piscina Arenas - V14", layout="wide", page_icon="🏊")
-DB_NAME = "piscina_v14_gestion.db"
-
-# Listas de referencia
-DIAS = ["Lunes-Miércoles-Viernes", "Martes-Jueves-Sábado"]
-HORAS = ["07:00-08:00", "08:00-09:00", "09:00-10:00", "10:00-11:00", 
-         "11:00-12:00", "12:00-13:00", "15:00-16:00", "16:00-17:00", 
-         "17:00-18:00", "18:00-19:00"]
-NIVELES = ["Básico 0", "Básico 1", "Básico 2", "Intermedio", "Avanzado"]
 
 # Estilos CSS
 st.markdown("""
@@ -29,99 +40,78 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # ==========================================
-# 1. GESTIÓN DE BASE DE DATOS
+# 1. BASE DE DATOS (paquete piscina)
 # ==========================================
-def run_query(query, params=(), return_data=False):
-    with sqlite3.connect(DB_NAME) as conn:
-        c = conn.cursor()
-        c.execute("PRAGMA foreign_keys = ON;") # Activar llaves foráneas
-        try:
-            c.execute(query, params)
-            if return_data: return c.fetchall()
-            conn.commit()
-            return True
-        except Exception as e:
-            st.error(f"Error BD: {e}")
-            return False
-
-def init_db():
-    # Tablas Base
-    run_query('''CREATE TABLE IF NOT EXISTS ciclos (id INTEGER PRIMARY KEY AUTOINCREMENT, nombre TEXT, fecha_inicio DATE)''')
-    run_query('''CREATE TABLE IF NOT EXISTS horarios (id INTEGER PRIMARY KEY AUTOINCREMENT, ciclo_id INTEGER, grupo TEXT, hora_inicio TEXT, nivel_salon TEXT, capacidad INTEGER, FOREIGN KEY(ciclo_id) REFERENCES ciclos(id))''')
-    run_query('''CREATE TABLE IF NOT EXISTS alumnos (id INTEGER PRIMARY KEY AUTOINCREMENT, nombre TEXT, apellido TEXT, telefono TEXT, direccion TEXT, nivel TEXT, apoderado TEXT, condicion TEXT)''')
-    run_query('''CREATE TABLE IF NOT EXISTS matriculas (id INTEGER PRIMARY KEY AUTOINCREMENT, alumno_id INTEGER, horario_id INTEGER, fecha_registro DATE, FOREIGN KEY(alumno_id) REFERENCES alumnos(id), FOREIGN KEY(horario_id) REFERENCES horarios(id))''')
-    run_query('''CREATE TABLE IF NOT EXISTS asistencia (id INTEGER PRIMARY KEY AUTOINCREMENT, alumno_id INTEGER, horario_id INTEGER, fecha TEXT, estado TEXT, UNIQUE(alumno_id, horario_id, fecha))''')
-    
-    # Tabla Recuperaciones (Visitantes)
-    run_query('''CREATE TABLE IF NOT EXISTS recuperaciones (
-                 id INTEGER PRIMARY KEY AUTOINCREMENT, 
-                 alumno_id INTEGER, 
-                 fecha_origen TEXT, 
-                 horario_destino_id INTEGER, 
-                 fecha_destino TEXT, 
-                 asistio BOOLEAN DEFAULT 0)''')
-                 
-    # NUEVA TABLA: INCIDENTES
-    run_query('''CREATE TABLE IF NOT EXISTS incidentes (
-                 id INTEGER PRIMARY KEY AUTOINCREMENT, 
-                 alumno_id INTEGER, 
-                 fecha DATE, 
-                 detalle TEXT, 
-                 gravedad TEXT)''')
-
-def generar_fechas_clase(fecha_inicio_str, grupo):
-    fechas = []
-    try:
-        if isinstance(fecha_inicio_str, str): curr = datetime.strptime(fecha_inicio_str, "%Y-%m-%d").date()
-        else: curr = fecha_inicio_str
-    except: curr = date.today()
-
-    target = [0, 2, 4] if "Lunes" in grupo else [1, 3, 5]
-    while curr.weekday() not in target: curr += timedelta(days=1)
-    while len(fechas) < 12:
-        if curr.weekday() in target: fechas.append(curr.strftime("%Y-%m-%d"))
-        curr += timedelta(days=1)
-    return fechas
-
-# Función segura para borrar alumno y todo su rastro
-def eliminar_alumno_total(aid):
-    run_query("DELETE FROM asistencia WHERE alumno_id=?", (aid,))
-    run_query("DELETE FROM matriculas WHERE alumno_id=?", (aid,))
-    run_query("DELETE FROM recuperaciones WHERE alumno_id=?", (aid,))
-    run_query("DELETE FROM incidentes WHERE alumno_id=?", (aid,))
-    run_query("DELETE FROM alumnos WHERE id=?", (aid,))
-    return True
-
+bd.avisar = st.error   # errores de run_query / run_many en pantalla
 init_db()
 
 # ==========================================
 # 2. MENÚ PRINCIPAL
 # ==========================================
+# El panel de rendimiento solo aparece con ?admin=1 en la URL
+ADMIN = st.query_params.get("admin") == "1"
+opciones = ["Configuración", "Matrícula", "👨‍🎓 Estudiantes", "Asistencia", "📊 Resumen", "🔄 Recuperaciones", "⛑️ Incidentes", "📑 Reportes"]
+iconos = ["gear", "person-plus", "people", "calendar-check", "bar-chart", "arrow-repeat", "bandaid", "file-earmark-arrow-down"]
+if ADMIN: opciones, iconos = opciones + ["🛠️ Rendimiento"], iconos + ["speedometer2"]
 with st.sidebar:
     st.image("https://cdn-icons-png.flaticon.com/512/2972/2972199.png", width=80)
     selected = option_menu(
         menu_title="Menú",
-        options=["Configuración", "Matrícula", "👨‍🎓 Estudiantes", "Asistencia", "🔄 Recuperaciones", "⛑️ Incidentes"],
-        icons=["gear", "person-plus", "people", "calendar-check", "arrow-repeat", "bandaid"],
+        options=opciones,
+        icons=iconos,
         default_index=0,
     )
+get_perfil().iniciar(selected)
+
+# Las grillas de asistencia que se conservan en la sesión se vuelven a leer al regresar a la página
+if selected != "Asistencia":
+    for k in [k for k in st.session_state if k.startswith(("asis_", "vis_", "ed_asis_", "ed_vis_"))]: del st.session_state[k]
 
 # ---------------------------------------------------------
 # MÓDULO 1: CONFIGURACIÓN
 # ---------------------------------------------------------
 if selected == "Configuración":
     st.title("⚙️ Configuración")
-    t1, t2 = st.tabs(["1. Ciclos", "2. Salones"])
+    t1, t2, t3 = st.tabs(["1. Ciclos", "2. Salones", "3. Feriados"])
     with t1:
         cn = st.text_input("Nombre Ciclo (Ej: Marzo 2026)")
         ci = st.date_input("Inicio de Clases")
         if st.button("Guardar Ciclo"):
-            run_query("INSERT INTO ciclos (nombre, fecha_inicio) VALUES (?, ?)", (cn, ci))
-            st.success("Ciclo creado.")
+            try:
+                crear_ciclo(cn, ci)
+                st.success("Ciclo creado.")
+            except sqlite3.Error as e: st.error(f"Error BD: {e}")
+        
+        # Eliminar un ciclo completo (matrículas, salones, asistencia y recuperaciones)
+        ciclos_p = listar_ciclos()
+        if ciclos_p:
+            with st.expander("🗑️ Eliminar ciclo"):
+                dcp = {c.nombre: c.id for c in ciclos_p}
+                scp = st.selectbox("Ciclo a eliminar", list(dcp.keys()), key="purga_c")
+                st.markdown("""<div class="error-box"><b>ZONA DE PELIGRO:</b> Se borran sus salones, matrículas, asistencias y recuperaciones. Los alumnos se conservan.</div>""", unsafe_allow_html=True)
+                clave_p = st.text_input("Escribe 'borrar' para confirmar:", key="purga_clave")
+                if st.button("ELIMINAR CICLO"):
+                    if clave_p == "borrar":
+                        try:
+                            purgar_ciclo(dcp[scp])
+                            st.success("Ciclo eliminado.")
+                            st.rerun()
+                        except sqlite3.Error as e: st.error(f"Error BD: {e}")
+                    else: st.error("Palabra clave incorrecta.")
+            with st.expander("📦 Archivar ciclo cerrado"):
+                st.caption(f"Mueve el ciclo y su historial a {ARCHIVO_DB}; sigue disponible en Reportes (fuente: Archivo).")
+                sca = st.selectbox("Ciclo a archivar", list(dcp.keys()), key="arch_c")
+                compactar = st.checkbox("Compactar la base después (VACUUM)", value=True)
+                if st.button("ARCHIVAR CICLO"):
+                    try:
+                        archivar_ciclo(dcp[sca], compactar=compactar)
+                        st.success("Ciclo archivado.")
+                        st.rerun()
+                    except sqlite3.Error as e: st.error(f"Error BD: {e}")
     with t2:
-        ciclos = run_query("SELECT id, nombre FROM ciclos ORDER BY id DESC", return_data=True)
+        ciclos = listar_ciclos()
         if ciclos:
-            opts = {n: i for i, n in ciclos}
+            opts = {c.nombre: c.id for c in ciclos}
             sc = st.selectbox("Ciclo", list(opts.keys()))
             c1, c2, c3 = st.columns(3)
             d = c1.selectbox("Días", DIAS)
@@ -129,53 +119,70 @@ if selected == "Configuración":
             n = c3.selectbox("Nivel", NIVELES)
             cap = st.number_input("Cupos", 10)
             if st.button("Crear Salón"):
-                res = run_query("SELECT id FROM horarios WHERE ciclo_id=? AND grupo=? AND hora_inicio=? AND nivel_salon=?", (opts[sc], d, h, n), return_data=True)
-                if not res:
-                    run_query("INSERT INTO horarios (ciclo_id, grupo, hora_inicio, nivel_salon, capacidad) VALUES (?,?,?,?,?)", (opts[sc], d, h, n, cap))
-                    st.success("Salón Creado.")
-                else: st.error("Ya existe.")
+                try:
+                    if crear_salon(opts[sc], d, h, n, cap):
+                        st.success("Salón Creado.")
+                    else: st.error("Ya existe.")
+                except sqlite3.Error as e: st.error(f"Error BD: {e}")
             st.write("---")
             # Opción para borrar salones vacíos
             st.subheader("Listado de Salones")
-            salones_df = run_query(f"SELECT id, grupo, hora_inicio, nivel_salon, capacidad FROM horarios WHERE ciclo_id={opts[sc]} ORDER BY hora_inicio", return_data=True)
+            salones_df = ocupacion_salones(opts[sc])
             if salones_df:
                 for s in salones_df:
-                    sid, sgr, sho, sni, sca = s
+                    sid, sgr, sho, sni, sca, soc = s
                     c_del1, c_del2 = st.columns([4, 1])
-                    c_del1.text(f"{sgr} | {sho} | {sni}")
+                    c_del1.text(f"{sgr} | {sho} | {sni} ({soc}/{sca})")
                     if c_del2.button("🗑️", key=f"del_sal_{sid}"):
-                        # Verificar si tiene matriculas
-                        cnt = run_query("SELECT COUNT(*) FROM matriculas WHERE horario_id=?", (sid,), return_data=True)[0][0]
-                        if cnt == 0:
-                            run_query("DELETE FROM horarios WHERE id=?", (sid,))
-                            st.rerun()
-                        else:
-                            st.error("No puedes borrar: tiene alumnos.")
+                        # Solo se borra si no tiene matrículas (verificado en la misma sentencia)
+                        try:
+                            if soc == 0 and eliminar_salones([sid]):
+                                st.rerun()
+                            else:
+                                st.error("No puedes borrar: tiene alumnos.")
+                        except sqlite3.Error as e: st.error(f"Error BD: {e}")
         else: st.warning("Crea un ciclo primero.")
+    with t3:
+        st.caption("Días sin clase: la sesión pasa a la siguiente fecha del grupo.")
+        c1, c2 = st.columns(2)
+        fe = c1.date_input("Fecha", key="fer_f")
+        mo = c2.text_input("Motivo", key="fer_m")
+        if st.button("Agregar Feriado"):
+            try:
+                agregar_feriado(fe, mo)
+                st.rerun()
+            except sqlite3.Error as e: st.error(f"Error BD: {e}")
+        for ff, fm in listar_feriados():
+            c_f1, c_f2 = st.columns([4, 1])
+            c_f1.text(f"{ff} | {fm}")
+            if c_f2.button("🗑️", key=f"del_fer_{ff}"):
+                try:
+                    quitar_feriado(ff)
+                    st.rerun()
+                except sqlite3.Error as e: st.error(f"Error BD: {e}")
 
 # ---------------------------------------------------------
 # MÓDULO 2: MATRÍCULA
 # ---------------------------------------------------------
 elif selected == "Matrícula":
     st.title("📝 Matrícula")
-    tab1, tab2 = st.tabs(["🆕 Nuevo Alumno", "🔄 Re-matrícula"])
+    tab1, tab2, tab3 = st.tabs(["🆕 Nuevo Alumno", "🔄 Re-matrícula", "📥 Importar"])
     
     with tab1:
-        ciclos = run_query("SELECT id, nombre FROM ciclos ORDER BY id DESC", return_data=True)
+        ciclos = listar_ciclos()
         if not ciclos: st.warning("Crea un ciclo."); st.stop()
-        dc = {n: i for i, n in ciclos}
+        dc = {c.nombre: c.id for c in ciclos}
         sc = st.selectbox("Ciclo:", list(dc.keys()), key="nc_c")
         c1, c2 = st.columns(2)
         sd = c1.radio("Días:", DIAS, key="nc_d")
         sh = c2.selectbox("Hora:", HORAS, key="nc_h")
         
-        salones = run_query("SELECT id, nivel_salon, capacidad FROM horarios WHERE ciclo_id=? AND grupo=? AND hora_inicio=?", (dc[sc], sd, sh), return_data=True)
+        salones = ocupacion_salones(dc[sc], sd, sh)
         
         if salones:
             ops = {}
             for s in salones:
-                hid, niv, cap = s
-                oc = run_query("SELECT COUNT(*) FROM matriculas WHERE horario_id=?", (hid,), return_data=True)[0][0]
+                hid, _, _, niv, cap, oc = s
                 lbl = f"{niv} ({cap-oc}/{cap} libres)"
                 if oc < cap: ops[lbl] = hid
                 else: ops[f"⛔ LLENO - {lbl}"] = None
@@ -195,11 +202,11 @@ elif selected == "Matrícula":
                     cn = st.text_area("Condición Médica/Especial")
                     if st.form_submit_button("Matricular"):
                         if nm and ap:
-                            run_query("INSERT INTO alumnos (nombre, apellido, telefono, direccion, nivel, apoderado, condicion) VALUES (?, ?, ?, ?, ?, ?, ?)", (nm, ap, tl, dr, "Registrado", pod, cn))
-                            aid = run_query("SELECT last_insert_rowid()", return_data=True)[0][0]
-                            run_query("INSERT INTO matriculas (alumno_id, horario_id, fecha_registro) VALUES (?, ?, ?)", (aid, hid_sel, date.today()))
-                            st.balloons()
-                            st.success(f"Matriculado. ID: {aid}")
+                            try:
+                                aid = matricular_alumno_nuevo(hid_sel, nm, ap, tl, dr, pod, cn)
+                                st.balloons()
+                                st.success(f"Matriculado. ID: {aid}")
+                            except sqlite3.Error as e: st.error(f"Error BD: {e}")
                         else: st.error("Faltan datos.")
         else: st.warning("No hay salones.")
 
@@ -207,28 +214,54 @@ elif selected == "Matrícula":
         st.info("Re-inscribir alumno antiguo en nuevo ciclo.")
         busq = st.text_input("Buscar Alumno:")
         if busq:
-            res = run_query(f"SELECT id, nombre, apellido, nivel FROM alumnos WHERE nombre LIKE '%{busq}%' OR apellido LIKE '%{busq}%'", return_data=True)
+            res = buscar_alumnos(busq)
             if res:
-                dic_al = {f"{r[1]} {r[2]} ({r[3]})": r[0] for r in res}
+                dic_al = {f"{r.nombre} {r.apellido} ({r.nivel})": r.id for r in res}
                 sel_al = st.selectbox("Alumno:", list(dic_al.keys()))
                 id_alum = dic_al[sel_al]
                 
                 # Selector simplificado
-                dc2 = {n: i for i, n in ciclos}
+                dc2 = dc
                 sc2 = st.selectbox("Ciclo Destino:", list(dc2.keys()), key="rm_c")
                 c1, c2 = st.columns(2)
                 sd2 = c1.radio("Días:", DIAS, key="rm_d")
                 sh2 = c2.selectbox("Hora:", HORAS, key="rm_h")
                 
-                salones2 = run_query("SELECT id, nivel_salon FROM horarios WHERE ciclo_id=? AND grupo=? AND hora_inicio=?", (dc2[sc2], sd2, sh2), return_data=True)
+                salones2 = ocupacion_salones(dc2[sc2], sd2, sh2)
                 if salones2:
-                    ops2 = {f"{s[1]}": s[0] for s in salones2}
+                    ops2 = {s.nivel_salon: s.id for s in salones2}
                     stx2 = st.selectbox("Salón:", list(ops2.keys()), key="rm_s")
                     if st.button("Confirmar Re-matrícula"):
-                        run_query("INSERT INTO matriculas (alumno_id, horario_id, fecha_registro) VALUES (?, ?, ?)", (id_alum, ops2[stx2], date.today()))
-                        st.success("Re-matriculado.")
+                        if matricular([(id_alum, ops2[stx2])]): st.success("Re-matriculado.")
                 else: st.warning("No hay salón.")
 
+    with tab3:
+        st.info("Matrícula masiva desde CSV o Excel. Columnas: " + ", ".join(COLUMNAS_IMPORT) + " (dias: LMV/MJS o el nombre completo).")
+        dc3 = dc
+        sc3 = st.selectbox("Ciclo:", list(dc3.keys()), key="imp_c")
+        arch = st.file_uploader("Archivo", type=["csv", "xlsx"], key="imp_f")
+        if arch:
+            confirmar = st.button("Importar")
+            try:
+                arch.seek(0)
+                resumen, errores = importar_alumnos(leer_archivo_alumnos(arch, arch.name), dc3[sc3], confirmar)
+            except ValueError as e:
+                st.error(str(e))
+            except sqlite3.Error as e:
+                st.error(f"Error BD: {e}")
+            else:
+                m1, m2, m3, m4 = st.columns(4)
+                m1.metric("Filas", resumen["filas"])
+                m2.metric("Alumnos nuevos", resumen["alumnos_nuevos"])
+                m3.metric("Matrículas", resumen["matriculas"])
+                m4.metric("Con error", resumen["errores"])
+                if confirmar: st.success(f"Importado: {resumen['matriculas']} matrículas.")
+                else: st.caption("Vista previa: aún no se guardó nada.")
+                if errores:
+                    dfe = pd.DataFrame(errores, columns=["Fila", "Alumno", "Error"])
+                    st.dataframe(dfe, hide_index=True)
+                    st.download_button("Descargar errores", dfe.to_csv(index=False).encode("utf-8"), "errores_importacion.csv", "text/csv")
+
 # ---------------------------------------------------------
 # MÓDULO 3: ESTUDIANTES (FICHA COMPLETA + BORRAR)
 # ---------------------------------------------------------
@@ -238,9 +271,17 @@ elif selected == "👨‍🎓 Estudiantes":
     
     search = st.text_input("🔍 Nombre o Apellido:")
     if search:
-        alumnos = run_query(f"SELECT * FROM alumnos WHERE nombre LIKE '%{search}%' OR apellido LIKE '%{search}%'", return_data=True)
+        alumnos = buscar_alumnos(search)
         if alumnos:
-            for alum in alumnos:
+            # Lista compacta (la tabla se dibuja virtualizada); la ficha, con sus contadores y
+            # formularios, solo se arma para el alumno seleccionado
+            lista = pd.DataFrame([{"Alumno": f"{a.nombre} {a.apellido}", "Nivel": a.nivel, "Teléfono": a.telefono,
+                                   "Apoderado": a.apoderado, "Condición": "🔴" if a.condicion else ""} for a in alumnos])
+            sel = st.dataframe(lista, hide_index=True, on_select="rerun", selection_mode="single-row", key=f"est_sel_{search}")
+            filas = [0] if len(alumnos) == 1 else sel.selection.rows
+            if not filas: st.caption("Selecciona un alumno para ver su ficha.")
+            else:
+                alum = alumnos[filas[0]]
                 aid, nom, ape, tel, dire, niv, apo, cond = alum
                 
                 # TARJETA DEL ESTUDIANTE
@@ -254,6 +295,9 @@ elif selected == "👨‍🎓 Estudiantes":
                         if cond: st.error(f"⚠️ **CONDICIÓN:** {cond}")
                         else: st.success("Salud: Sin condiciones reportadas")
 
+                    for _, _, _, cic, sal, pr, fa, ju, rc, rest in resumen_matriculas(alumno_ids=[aid]):
+                        st.caption(f"📅 {cic} | {sal}: ✅ {pr} ❌ {fa} 🤧 {ju} 🔄 {rc} · faltan {rest} de {CLASES_META}")
+
                     st.write("---")
                     
                     # PESTAÑAS DENTRO DE LA TARJETA
@@ -266,7 +310,7 @@ elif selected == "👨‍🎓 Estudiantes":
                             na = st.text_input("Apoderado", value=apo)
                             nc = st.text_area("Condición", value=cond)
                             if st.form_submit_button("Guardar Cambios"):
-                                run_query("UPDATE alumnos SET telefono=?, direccion=?, apoderado=?, condicion=? WHERE id=?", (nt, nd, na, nc, aid))
+                                actualizar_contacto(aid, nt, nd, na, nc)
                                 st.success("Actualizado.")
                                 st.rerun()
 
@@ -279,9 +323,11 @@ elif selected == "👨‍🎓 Estudiantes":
                         clave = st.text_input("Escribe 'borrar' para confirmar:", key=f"pass_{aid}")
                         if st.button("CONFIRMAR ELIMINACIÓN", key=f"btn_del_{aid}"):
                             if clave == "borrar":
-                                eliminar_alumno_total(aid)
-                                st.success("Alumno eliminado.")
-                                st.rerun()
+                                try:
+                                    eliminar_alumno_total(aid)
+                                    st.success("Alumno eliminado.")
+                                    st.rerun()
+                                except sqlite3.Error as e: st.error(f"Error BD: {e}")
                             else:
                                 st.error("Palabra clave incorrecta.")
         else: st.info("No encontrado.")
@@ -291,58 +337,66 @@ elif selected == "👨‍🎓 Estudiantes":
 # ---------------------------------------------------------
 elif selected == "Asistencia":
     st.title("📅 Asistencia y Visitantes")
-    ciclos = run_query("SELECT id, nombre, fecha_inicio FROM ciclos", return_data=True)
+    ciclos = listar_ciclos()
     if not ciclos: st.stop()
-    dc = {n: (i, f) for i, n, f in ciclos}
+    dc = {c.nombre: c.id for c in ciclos}
     sc = st.selectbox("Ciclo:", list(dc.keys()))
-    cid, cfecha = dc[sc]
+    cid = dc[sc]
     
     c1, c2, c3 = st.columns(3)
     sd = c1.selectbox("Día", DIAS)
     sh = c2.selectbox("Hora", HORAS)
-    ns = run_query("SELECT id, nivel_salon FROM horarios WHERE ciclo_id=? AND grupo=? AND hora_inicio=?", (cid, sd, sh), return_data=True)
+    ns = ocupacion_salones(cid, sd, sh)
     
     if ns:
-        dn = {n: i for i, n in ns}
+        dn = {s.nivel_salon: s.id for s in ns}
         sn = c3.selectbox("Salón:", list(dn.keys()))
         hid = dn[sn]
         
         st.divider()
         
         # 1. TABLA REGULARES
-        st.subheader("📋 Alumnos Matriculados")
-        al_reg = run_query("SELECT a.id, a.nombre, a.apellido, a.condicion FROM alumnos a JOIN matriculas m ON a.id = m.alumno_id WHERE m.horario_id = ?", (hid,), return_data=True)
-        fechas = generar_fechas_clase(cfecha, sd)
-        
-        if al_reg:
-            asist = run_query("SELECT alumno_id, fecha, estado FROM asistencia WHERE horario_id=?", (hid,), return_data=True)
-            mapa = {(r[0], r[1]): r[2] for r in asist}
+        t_reg, t_rec = st.columns([3, 1])
+        t_reg.subheader("📋 Alumnos Matriculados")
+        # La grilla se toma una vez y se conserva en la sesión: al guardar se compara contra lo que
+        # se vio (control optimista), no contra lo que otra sesión haya escrito mientras tanto
+        k_asis, k_ed = f"asis_{hid}", f"ed_asis_{hid}"
+        # Recargar siempre disponible: también si la grilla o los visitantes se tomaron vacíos
+        if t_rec.button("🔄 Recargar"):
+            for k in (k_asis, k_ed, f"vis_{hid}", f"ed_vis_{hid}"): st.session_state.pop(k, None)
+            st.rerun()
+        if k_asis not in st.session_state:
+            al_reg, mapa = asistencia_salon(hid)
+            fechas = fechas_clase(cid, sd)
             data = []
             for al in al_reg:
-                row = {"ID": al[0], "Alumno": f"{al[1]} {al[2]}" + (" 🔴" if al[3] else "")}
+                row = {"ID": al.id, "Alumno": f"{al.nombre} {al.apellido}" + (" 🔴" if al.condicion else "")}
                 for f in fechas:
-                    est = mapa.get((al[0], f))
+                    est = mapa.get((al.id, f))
                     row[f] = "✅" if est == "Presente" else ("❌" if est == "Falta" else ("🤧" if est == "Justificado" else None))
                 data.append(row)
-            
-            df = pd.DataFrame(data)
+            st.session_state[k_asis] = pd.DataFrame(data)
+        df = st.session_state[k_asis]
+        
+        if not df.empty:
+            fechas = [col for col in df.columns if col not in ("ID", "Alumno")]
             cfg = {"ID": None, "Alumno": st.column_config.TextColumn(disabled=True, width="medium")}
             for f in fechas: cfg[f] = st.column_config.SelectboxColumn(f[5:], options=["✅", "❌", "🤧"], width="small", required=False)
             
-            edited = st.data_editor(df, column_config=cfg, hide_index=True)
+            edited = st.data_editor(df, column_config=cfg, hide_index=True, key=k_ed)
             
             if st.button("Guardar Asistencia Regulares"):
-                conn = sqlite3.connect(DB_NAME)
-                c = conn.cursor()
-                for i, r in edited.iterrows():
-                    for f in fechas:
-                        val = r[f]
-                        est = "Presente" if val=="✅" else ("Falta" if val=="❌" else ("Justificado" if val=="🤧" else None))
-                        if est: c.execute("INSERT OR REPLACE INTO asistencia (alumno_id, horario_id, fecha, estado) VALUES (?,?,?,?)", (r["ID"], hid, f, est))
-                        elif val is None: c.execute("DELETE FROM asistencia WHERE alumno_id=? AND horario_id=? AND fecha=?", (r["ID"], hid, f))
-                conn.commit()
-                conn.close()
-                st.success("Guardado.")
+                # Solo las celdas modificadas; se rechaza si otra sesión cambió alguna de ellas
+                try:
+                    n = guardar_asistencia(hid, diff_asistencia(df, edited, fechas))
+                    st.session_state[k_asis] = edited.copy()
+                    st.session_state.pop(k_ed, None)
+                    st.success(f"Guardado. {n} celdas actualizadas.")
+                except ConflictoEdicion as e:
+                    nombres = dict(zip(df["ID"], df["Alumno"]))
+                    st.warning("Otra sesión modificó estas celdas; recarga la grilla y vuelve a marcarlas: "
+                               + ", ".join(f"{nombres.get(a, a)} {f[5:]} ({actual or 'vacío'})" for a, f, actual in e.conflictos))
+                except sqlite3.Error as e: st.error(f"Error BD: {e}")
         else: st.warning("Salón sin alumnos matriculados.")
         
         # 2. SECCIÓN VISITANTES (RECUPERACIONES) - CORREGIDO
@@ -350,19 +404,11 @@ elif selected == "Asistencia":
         st.subheader("🟢 Alumnos Visitantes (Recuperación)")
         st.markdown("Alumnos de otros horarios que vienen a recuperar clase HOY o en estas fechas.")
         
-        # Busca recuperaciones asignadas a ESTE horario (hid)
-        visitantes = run_query("""
-            SELECT r.id, r.fecha_destino, a.nombre, a.apellido, r.asistio
-            FROM recuperaciones r
-            JOIN alumnos a ON r.alumno_id = a.id
-            WHERE r.horario_destino_id = ?
-            ORDER BY r.fecha_destino
-        """, (hid,), return_data=True)
-        
-        if visitantes:
-            # Mostramos una tabla simple para marcar su asistencia
+        # Busca recuperaciones asignadas a ESTE horario (hid); misma foto en sesión que la grilla
+        k_vis, k_ed_vis = f"vis_{hid}", f"ed_vis_{hid}"
+        if k_vis not in st.session_state:
             vis_data = []
-            for v in visitantes:
+            for v in visitantes_salon(hid):
                 rid, f_dest, nom, ape, asistio = v
                 vis_data.append({
                     "RID": rid,
@@ -370,74 +416,131 @@ elif selected == "Asistencia":
                     "Alumno": f"{nom} {ape}",
                     "Asistió": True if asistio else False
                 })
-            
-            df_vis = pd.DataFrame(vis_data)
+            st.session_state[k_vis] = pd.DataFrame(vis_data)
+        df_vis = st.session_state[k_vis]
+        
+        if not df_vis.empty:
+            # Mostramos una tabla simple para marcar su asistencia
             edited_vis = st.data_editor(df_vis, column_config={
                 "RID": None,
                 "Asistió": st.column_config.CheckboxColumn("¿Vino?", default=False)
-            }, hide_index=True, key="editor_visitantes")
+            }, hide_index=True, key=k_ed_vis)
             
             if st.button("Confirmar Asistencia Visitantes"):
-                conn = sqlite3.connect(DB_NAME)
-                c = conn.cursor()
-                for i, r in edited_vis.iterrows():
-                    # Actualizar tabla recuperaciones
-                    c.execute("UPDATE recuperaciones SET asistio=? WHERE id=?", (1 if r["Asistió"] else 0, r["RID"]))
-                conn.commit()
-                conn.close()
-                st.success("Visitantes actualizados.")
+                # Actualizar solo las recuperaciones que cambiaron
+                nuevo = edited_vis["Asistió"].fillna(False).astype(bool)
+                cambio = nuevo != df_vis["Asistió"]
+                upd = [(int(a), int(rid), int(antes)) for a, rid, antes in zip(nuevo[cambio], edited_vis.loc[cambio, "RID"], df_vis.loc[cambio, "Asistió"])]
+                try:
+                    n = marcar_visitantes(upd)
+                    st.session_state[k_vis] = edited_vis.assign(**{"Asistió": nuevo})
+                    st.session_state.pop(k_ed_vis, None)
+                    st.success(f"Visitantes actualizados. {n} cambios.")
+                except ConflictoEdicion:
+                    st.warning("Otra sesión cambió estos visitantes; recarga la grilla y vuelve a marcarlos.")
+                except sqlite3.Error as e: st.error(f"Error BD: {e}")
         else:
             st.info("No hay alumnos recuperando clase en este salón.")
         
         st.markdown("</div>", unsafe_allow_html=True)
 
+# ---------------------------------------------------------
+# MÓDULO 4B: RESUMEN (CONTADOR DE 12 CLASES)
+# ---------------------------------------------------------
+elif selected == "📊 Resumen":
+    st.title("📊 Resumen de Clases")
+    ciclos = listar_ciclos()
+    if not ciclos: st.stop()
+    dc = {c.nombre: c.id for c in ciclos}
+    sc = st.selectbox("Ciclo:", list(dc.keys()), key="rs_c")
+    filas = resumen_matriculas(dc[sc])
+    if filas:
+        df = pd.DataFrame(filas, columns=["AID", "Alumno", "HID", "Ciclo", "Salón", "Presentes", "Faltas", "Justificadas", "Recuperadas", "Restantes"])
+        df["Avance"] = df["Presentes"] + df["Recuperadas"]
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric("Matrículas", len(df))
+        marcadas = df[["Presentes", "Faltas", "Justificadas"]].to_numpy().sum()
+        m2.metric("Asistencia", f"{df['Presentes'].sum() / marcadas:.0%}" if marcadas else "-")
+        m3.metric("Justificadas sin recuperar", int((df["Justificadas"] - df["Recuperadas"]).clip(lower=0).sum()))
+        m4.metric("Completaron la meta", int((df["Avance"] >= CLASES_META).sum()))
+        st.dataframe(df.drop(columns=["AID", "HID", "Ciclo"]), column_config={
+            "Avance": st.column_config.ProgressColumn(f"Avance (meta {CLASES_META})", min_value=0, max_value=CLASES_META, format="%d"),
+        }, hide_index=True)
+    else: st.info("Sin matrículas en este ciclo.")
+
 # ---------------------------------------------------------
 # MÓDULO 5: RECUPERACIONES
 # ---------------------------------------------------------
 elif selected == "🔄 Recuperaciones":
     st.title("Gestión de Justificaciones")
+    # Resultado del último guardado (se muestra tras el rerun que refresca las listas)
+    for tipo, msg in st.session_state.pop("rec_avisos", []): getattr(st, tipo)(msg)
+    guardar = {}   # (alumno_id, fecha_origen, horario_destino_id, fecha_destino) -> alumno, a guardar en este rerun
     
     # Pendientes
     st.subheader("1. Faltas Justificadas (Pendientes de Agendar)")
-    pendientes = run_query("""
-        SELECT asis.alumno_id, a.nombre, a.apellido, asis.fecha, h.grupo, a.nivel
-        FROM asistencia asis
-        JOIN alumnos a ON asis.alumno_id = a.id
-        JOIN horarios h ON asis.horario_id = h.id
-        WHERE asis.estado = 'Justificado'
-        AND NOT EXISTS (SELECT 1 FROM recuperaciones r WHERE r.alumno_id = asis.alumno_id AND r.fecha_origen = asis.fecha)
-    """, return_data=True)
+    pag = st.session_state.get("pag_pend", 1)
+    pendientes = pendientes_recuperacion(PAGINA_PENDIENTES, (pag - 1) * PAGINA_PENDIENTES)
+    if not pendientes and pag > 1:
+        st.session_state["pag_pend"] = 1
+        st.rerun()
     
     if pendientes:
+        total = pendientes[0].total
+        n_pag = -(-total // PAGINA_PENDIENTES)
+        st.caption(f"{total} faltas pendientes")
+        if n_pag > 1: st.number_input("Página", min_value=1, max_value=n_pag, key="pag_pend")
         for p in pendientes:
-            aid, nom, ape, f_falta, grup, niv = p
-            with st.form(f"rec_{aid}_{f_falta}"):
-                st.markdown(f"**{nom} {ape}** faltó el {f_falta} ({grup})")
-                f_new = st.date_input("Fecha Recuperación", min_value=date.today())
-                
-                # Buscar salones compatibles
-                h_dest = run_query(f"SELECT h.id, h.grupo, h.hora_inicio, h.nivel_salon, c.nombre FROM horarios h JOIN ciclos c ON h.ciclo_id = c.id WHERE h.nivel_salon = '{niv}'", return_data=True)
-                if not h_dest: h_dest = run_query("SELECT h.id, h.grupo, h.hora_inicio, h.nivel_salon, c.nombre FROM horarios h JOIN ciclos c ON h.ciclo_id = c.id", return_data=True)
+            aid, nom, ape, f_falta, grup, niv, hid_o, _ = p
+            with st.container(border=True):
+                st.markdown(f"**{nom} {ape}** faltó el {f_falta} ({grup} - {niv})")
+                c1, c2, c3 = st.columns([1, 2, 1])
+                f_new = c1.date_input("Fecha Recuperación", min_value=date.today(), key=f"rf_{aid}_{hid_o}_{f_falta}")
                 
-                op_h = {f"{h[4]} | {h[1]} {h[2]} ({h[3]})": h[0] for h in h_dest}
-                sel_hd = st.selectbox("Salón Destino", list(op_h.keys()))
-                
-                if st.form_submit_button("Agendar"):
-                    run_query("INSERT INTO recuperaciones (alumno_id, fecha_origen, horario_destino_id, fecha_destino) VALUES (?,?,?,?)", (aid, f_falta, op_h[sel_hd], str(f_new)))
-                    st.success("Agendado.")
-                    st.rerun()
+                # Salones del mismo nivel que tienen clase ese día (consulta por índice, cacheada por fecha)
+                f_str = f_new.strftime("%Y-%m-%d")
+                op_h = {s.etiqueta: s.id for s in salones_en_fecha(f_str, niv)}
+                if op_h:
+                    sel_hd = c2.selectbox("Salón Destino", list(op_h.keys()), key=f"rs_{aid}_{hid_o}_{f_falta}")
+                    if c3.button("Agendar", key=f"rb_{aid}_{hid_o}_{f_falta}"):
+                        guardar = {(aid, f_falta, op_h[sel_hd], f_str): f"{nom} {ape}"}
+                else: c2.warning("Ningún salón compatible tiene clase ese día.")
     else: st.success("No hay pendientes.")
 
+    # Agenda automática (vista previa antes de guardar)
+    if pendientes:
+        with st.expander("⚡ Agendar todas automáticamente"):
+            ca1, ca2 = st.columns(2)
+            h_pref = ca1.multiselect("Horas preferidas", HORAS, default=HORAS)
+            horiz = ca2.slider("Días hacia adelante", 7, 90, 30)
+            if st.toggle("Calcular propuesta"):
+                # La propuesta mostrada se guarda tal cual; solo se recalcula si cambian los parámetros
+                prev = st.session_state.get("plan_rec")
+                if prev is None or prev[0] != (h_pref, horiz):
+                    prev = st.session_state["plan_rec"] = ((h_pref, horiz), *planificar_recuperaciones(h_pref, horiz))
+                _, plan, sin_cupo = prev
+                if plan:
+                    st.dataframe(pd.DataFrame([(f"{n} {a}", ff, fd, lbl) for _, n, a, ff, _, fd, lbl in plan],
+                                              columns=["Alumno", "Faltó", "Recupera", "Salón"]), hide_index=True)
+                if sin_cupo: st.warning(f"{len(sin_cupo)} faltas sin turno disponible en ese rango.")
+                if plan and st.button(f"Confirmar {len(plan)} recuperaciones"):
+                    guardar = {(p.alumno_id, p.fecha_origen, p.horario_id, p.fecha_destino): f"{p.nombre} {p.apellido}" for p in plan}
+            else: st.session_state.pop("plan_rec", None)
+
+    if guardar:
+        try:
+            n, rechazadas = agendar_recuperaciones(guardar)
+            avisos = [("success", f"{n} recuperaciones agendadas.")] if n else []
+            avisos += [("warning", f"{guardar[fila]} ({fila[1]} → {fila[3]}): {motivo}") for fila, motivo in rechazadas]
+            st.session_state["rec_avisos"] = avisos
+            st.session_state.pop("plan_rec", None)
+            st.rerun()
+        except sqlite3.Error as e: st.error(f"Error BD: {e}")
+
     # Lista
     st.write("---")
     st.subheader("2. Calendario de Recuperaciones")
-    hist = run_query("""
-        SELECT r.fecha_destino, a.nombre, a.apellido, h.hora_inicio, h.nivel_salon, r.asistio
-        FROM recuperaciones r
-        JOIN alumnos a ON r.alumno_id = a.id
-        JOIN horarios h ON r.horario_destino_id = h.id
-        ORDER BY r.fecha_destino
-    """, return_data=True)
+    hist = calendario_recuperaciones()
     if hist:
         dfh = pd.DataFrame(hist, columns=["Fecha", "Alumno", "Apellido", "Hora", "Salón", "Asistió"])
         dfh["Asistió"] = dfh["Asistió"].apply(lambda x: "Sí" if x else "Pendiente/No")
@@ -459,39 +562,163 @@ elif selected == "⛑️ Incidentes":
             nm_inc = st.text_input("Buscar Alumno (Nombre):")
             alum_sel_id = None
             if nm_inc:
-                res = run_query(f"SELECT id, nombre, apellido FROM alumnos WHERE nombre LIKE '%{nm_inc}%'", return_data=True)
+                res = buscar_alumnos(nm_inc)
                 if res:
-                    dic_inc = {f"{r[1]} {r[2]}": r[0] for r in res}
+                    dic_inc = {f"{r.nombre} {r.apellido}": r.id for r in res}
                     sel_nm = st.selectbox("Seleccionar:", list(dic_inc.keys()))
                     alum_sel_id = dic_inc[sel_nm]
             
             f_inc = st.date_input("Fecha del Incidente")
             det_inc = st.text_area("Detalles del suceso", placeholder="Ej: El alumno resbaló al borde de la piscina...")
-            grav = st.selectbox("Gravedad", ["Leve", "Moderada", "Grave (Hospital)", "Crítica"])
+            grav = st.selectbox("Gravedad", GRAVEDADES)
             
             if st.form_submit_button("Registrar Incidente"):
                 if alum_sel_id and det_inc:
-                    run_query("INSERT INTO incidentes (alumno_id, fecha, detalle, gravedad) VALUES (?,?,?,?)", (alum_sel_id, f_inc, det_inc, grav))
+                    registrar_incidente(alum_sel_id, f_inc, det_inc, grav)
                     st.error("Incidente Registrado.")
                 else:
                     st.warning("Busca un alumno y escribe detalles.")
 
     with col_hist:
         st.subheader("Historial de Incidentes")
-        data_inc = run_query("""
-            SELECT i.fecha, a.nombre, a.apellido, i.gravedad, i.detalle 
-            FROM incidentes i JOIN alumnos a ON i.alumno_id = a.id 
-            ORDER BY i.id DESC
-        """, return_data=True)
+        # Filtros (al cambiarlos se vuelve a la primera página)
+        f1, f2, f3 = st.columns(3)
+        g_fil = f1.selectbox("Gravedad", ["Todas"] + GRAVEDADES, key="inc_grav")
+        rango = f2.date_input("Entre fechas", value=(), key="inc_rango")
+        al_fil = f3.text_input("Alumno", key="inc_alumno")
+        filtros = {"gravedad": None if g_fil == "Todas" else g_fil, "desde": rango[0] if rango else None,
+                   "hasta": rango[1] if len(rango) > 1 else None, "alumno_id": None}
+        if al_fil:
+            res = buscar_alumnos(al_fil)
+            if not res: st.info("Alumno no encontrado."); st.stop()
+            dic_fil = {f"{r.nombre} {r.apellido} ({r.id})": r.id for r in res}
+            filtros["alumno_id"] = dic_fil[st.selectbox("Incidentes de:", list(dic_fil.keys()), key="inc_alumno_sel")]
+        
+        # Paginación por llave: la pila guarda la llave (fecha, id) con que empieza cada página vista
+        if st.session_state.get("inc_filtros") != filtros:
+            st.session_state["inc_filtros"], st.session_state["inc_cursores"] = filtros, [None]
+        cursores = st.session_state["inc_cursores"]
+        data_inc = historial_incidentes(PAGINA_INCIDENTES + 1, cursores[-1], **filtros)
+        hay_mas, data_inc = len(data_inc) > PAGINA_INCIDENTES, data_inc[:PAGINA_INCIDENTES]
         if data_inc:
-            for row in data_inc:
-                f, n, a, g, d = row
+            # Una sola pieza de HTML por página
+            tarjetas = []
+            for _, f, n, a, g, d in data_inc:
                 color = "orange" if g == "Moderada" else ("red" if "Grave" in g else "green")
-                st.markdown(f"""
+                tarjetas.append(f"""
                 <div style="border-left: 5px solid {color}; padding: 10px; background: #f9f9f9; margin-bottom: 10px;">
-                    <b>{f} | {n} {a}</b> <span style="color:{color}">({g})</span><br>
-                    {d}
-                </div>
-                """, unsafe_allow_html=True)
+                    <b>{f} | {escape(n)} {escape(a)}</b> <span style="color:{color}">({g})</span><br>
+                    {escape(d or "")}
+                </div>""")
+            st.markdown("".join(tarjetas), unsafe_allow_html=True)
+            p1, p2, p3 = st.columns([1, 1, 1])
+            if p1.button("◀ Más recientes", disabled=len(cursores) == 1):
+                cursores.pop(); st.rerun()
+            p2.caption(f"Página {len(cursores)}")
+            if p3.button("Más antiguos ▶", disabled=not hay_mas):
+                cursores.append((data_inc[-1].fecha, data_inc[-1].id)); st.rerun()
+        elif len(cursores) > 1:
+            # La página quedó vacía (se borraron incidentes): se vuelve a la primera
+            st.session_state["inc_cursores"] = [None]; st.rerun()
         else:
             st.info("Sin incidentes reportados.")
+
+# ---------------------------------------------------------
+# MÓDULO 7: REPORTES Y EXPORTACIÓN
+# ---------------------------------------------------------
+elif selected == "📑 Reportes":
+    st.title("📑 Reportes")
+    archivo = ArchivoBD()
+    fuente = st.radio("Fuente:", ["Activos", "Archivo"], horizontal=True, key="rep_src") if archivo.existe() else "Activos"
+    origen = archivo if fuente == "Archivo" else get_pool()
+    ciclos = listar_ciclos(pool=origen if fuente == "Archivo" else None)
+    if not ciclos: st.info("Sin ciclos."); st.stop()
+    dc = {c.nombre: c.id for c in ciclos}
+    c1, c2, c3 = st.columns(3)
+    sc = c1.selectbox("Ciclo:", list(dc.keys()), key="rep_c")
+    rep = c2.selectbox("Reporte:", list(REPORTES.keys()), key="rep_r")
+    fmt = c3.radio("Formato:", list(FORMATOS.keys()), horizontal=True, key="rep_f")
+    
+    # Vista previa: solo el primer lote
+    with closing(bloques_consulta(*REPORTES[rep](dc[sc]), pool=origen, lote=200)) as bloques:
+        previa = next(bloques, None)
+    if previa is not None:
+        st.dataframe(previa, hide_index=True)
+        if len(previa) == 200: st.caption("Vista previa de las primeras 200 filas.")
+        pool, cid = origen, dc[sc]
+        _, ext, mime = FORMATOS[fmt]
+        st.download_button(f"⬇️ Descargar {fmt}", data=lambda: generar_reporte(rep, cid, fmt, pool),
+                           file_name=f"{rep.lower().replace(' ', '_')}_{sc}.{ext}", mime=mime)
+    else: st.info("Sin datos para este ciclo.")
+
+# ---------------------------------------------------------
+# MÓDULO 8: RENDIMIENTO (solo admin)
+# ---------------------------------------------------------
+elif selected == "🛠️ Rendimiento":
+    st.title("🛠️ Rendimiento")
+    perfil = get_perfil()
+    perfil.activo = st.toggle("Medir consultas", value=perfil.activo, help="Registra cada sentencia SQL de los próximos reruns.")
+    
+    cs = get_pool().cache.stats()
+    k1, k2, k3, k4 = st.columns(4)
+    k1.metric("Caché hits", cs["hits"]); k2.metric("Caché misses", cs["misses"])
+    k3.metric("Desalojos", cs["desalojos"]); k4.metric("Invalidaciones", cs["invalidaciones"])
+    
+    # Escritor único: trabajos agrupados por transacción, reintentos por base ocupada y conflictos de edición
+    es = get_pool().escritor.stats()
+    e1, e2, e3, e4, e5 = st.columns(5)
+    e1.metric("Escrituras", es["trabajos"]); e2.metric("Transacciones", es["transacciones"]); e3.metric("En cola", es["en_cola"])
+    e4.metric("Reintentos", es["reintentos"]); e5.metric("Conflictos", es["conflictos"])
+    
+    # Se excluye el rerun actual: solo mediría este panel
+    reruns = [r for r in perfil.datos() if r["pagina"] != "🛠️ Rendimiento"]
+    if not reruns:
+        st.info("Sin mediciones. Activa la medición y navega por las páginas a analizar."); st.stop()
+    
+    st.subheader("Reruns recientes")
+    st.dataframe(pd.DataFrame([{"Rerun": r["rerun"], "Página": r["pagina"], "Hora": r["inicio"], "Consultas": len(r["consultas"]),
+                                "ms SQL": round(sum(q["ms"] for q in r["consultas"]), 1), "Filas": sum(q["filas"] for q in r["consultas"])}
+                               for r in reversed(reruns)]), hide_index=True)
+    
+    paginas = sorted({r["pagina"] for r in reruns})
+    pag = st.selectbox("Página:", ["Todas"] + paginas, key="perf_pag")
+    consultas = [q for r in reruns if pag in ("Todas", r["pagina"]) for q in r["consultas"]]
+    
+    st.subheader("Sentencias más lentas")
+    if consultas:
+        agg = pd.DataFrame(consultas).groupby("sql").agg(veces=("ms", "size"), ms_total=("ms", "sum"), ms_max=("ms", "max"),
+                                                         filas=("filas", "sum"), origen=("origen", "first"))
+        top = agg.sort_values("ms_total", ascending=False).head(15).reset_index()
+        st.dataframe(top.round(2), hide_index=True)
+    else: st.info("Ningún rerun medido ejecutó SQL (todo salió de la caché).")
+    
+    # N+1: la misma sentencia con distintos parámetros muchas veces dentro de un mismo rerun
+    st.subheader("Posibles N+1")
+    n1 = []
+    for r in reruns:
+        if pag not in ("Todas", r["pagina"]): continue
+        por_sql = {}
+        for q in r["consultas"]: por_sql.setdefault(q["sql"], []).append(q)
+        for sql, qs in por_sql.items():
+            distintas = len({q["huella"] for q in qs})
+            if len(qs) > UMBRAL_N1 and distintas > 1:
+                n1.append({"Rerun": r["rerun"], "Página": r["pagina"], "Veces": len(qs), "Parámetros distintos": distintas,
+                           "ms": round(sum(q["ms"] for q in qs), 1), "Origen": qs[0]["origen"], "SQL": sql})
+    if n1: st.dataframe(pd.DataFrame(n1).sort_values("Veces", ascending=False), hide_index=True)
+    else: st.success("Sin patrones N+1 detectados.")
+    
+    if consultas:
+        st.subheader("Plan de ejecución")
+        sel = st.selectbox("Sentencia:", top["sql"].tolist(), key="perf_sql")
+        forma = next(q["forma"] for q in consultas if q["sql"] == sel)
+        try:
+            plan = bd.explicar(sel, forma)
+            nivel = {0: -1}
+            for pid, padre, _, det in plan: nivel[pid] = nivel.get(padre, -1) + 1
+            st.code("\n".join("  " * nivel[pid] + det for pid, _, _, det in plan) or "(sin plan)")
+        except sqlite3.Error as e: st.warning(f"No se pudo obtener el plan: {e}")
+    
+    c1, c2 = st.columns(2)
+    c1.download_button("⬇️ Exportar JSON", data=json.dumps({"cache": cs, "reruns": reruns}, ensure_ascii=False, indent=1),
+                       file_name=f"perfil_{date.today()}.json", mime="application/json")
+    if c2.button("🧹 Limpiar mediciones"): perfil.limpiar(); st.rerun()
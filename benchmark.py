@@ -0,0 +1,221 @@
+# Datos sintéticos y medición de la capa de datos (paquete piscina)
+#
+#   python benchmark.py sembrar --dir bench            # llena una BD con volumen de producción
+#   python benchmark.py medir --dir bench              # compara contra benchmark_base.json
+#   python benchmark.py medir --dir bench --guardar    # actualiza la línea base
+#
+# "medir" termina con código 1 si alguna consulta empeora más que la tolerancia.
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+from piscina import alumnos, asistencia, bd, ciclos, config, esquema, horarios, incidentes, matriculas, recuperaciones
+
+BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_base.json")
+
+NOMBRES = ["Mateo", "Valentina", "Santiago", "Camila", "Sebastián", "Lucía", "Thiago", "Sofía", "Gael", "Isabella",
+           "Adrián", "Mariana", "Joaquín", "Renata", "Diego", "Ximena", "Nicolás", "Antonella", "Dylan", "Fernanda",
+           "Leonardo", "Daniela", "Gabriel", "Valeria", "Emiliano", "Luciana", "Matías", "Ariana", "Rodrigo", "Zoe"]
+APELLIDOS = ["Quispe", "Flores", "Sánchez", "Rodríguez", "García", "Rojas", "Gonzales", "Huamán", "Vásquez", "Ramírez",
+             "Mendoza", "Chávez", "Torres", "Espinoza", "Castillo", "Mamani", "Díaz", "Gutiérrez", "Pérez", "Ruiz",
+             "Salazar", "Vargas", "Romero", "Cárdenas", "Ñahui", "Paredes", "Córdova", "Cáceres", "Zúñiga", "Medina"]
+CONDICIONES = ["asma", "alergia al cloro", "otitis recurrente", "epilepsia controlada", "diabetes tipo 1"]
+DETALLES = ["Resbaló al borde de la piscina", "Golpe leve con la corchera", "Tragó agua y se asustó",
+            "Calambre durante la clase", "Sangrado nasal", "Corte en el pie en la ducha"]
+GRAVEDADES = ["Leve"] * 6 + ["Moderada"] * 3 + ["Grave (Hospital)", "Crítica"]
+LOTE = 50000
+
+def abrir_bd(directorio):
+    # La BD (config.DB_NAME) se crea o abre dentro del directorio de trabajo
+    os.makedirs(directorio, exist_ok=True)
+    os.chdir(directorio)
+    esquema.init_db()
+
+def lotes(filas, c, sql):
+    lote = []
+    for f in filas:
+        lote.append(f)
+        if len(lote) >= LOTE: c.executemany(sql, lote); lote.clear()
+    if lote: c.executemany(sql, lote)
+
+def sembrar(args):
+    abrir_bd(args.dir)
+    if bd.run_query("SELECT 1 FROM ciclos LIMIT 1", return_data=True):
+        sys.exit(f"{os.path.abspath(config.DB_NAME)} ya tiene datos; usa un directorio vacío.")
+    rnd = random.Random(args.semilla)
+    hoy = date.fromisoformat(args.hoy)
+    t0 = time.perf_counter()
+
+    def poblar(c):
+        # Alumnos, repartidos por nivel
+        fichas = [(rnd.choice(NOMBRES), f"{rnd.choice(APELLIDOS)} {rnd.choice(APELLIDOS)}", f"9{rnd.randrange(10**8):08d}",
+                    f"Calle {rnd.randint(1, 800)}", rnd.choice(config.NIVELES), rnd.choice(["Mamá", "Papá", "Abuela", "Tío"]),
+                    rnd.choice(CONDICIONES) if rnd.random() < 0.05 else "") for _ in range(args.alumnos)]
+        lotes(fichas, c, "INSERT INTO alumnos (nombre, apellido, telefono, direccion, nivel, apoderado, condicion) VALUES (?,?,?,?,?,?,?)")
+        por_nivel = {}
+        for aid, niv in c.execute("SELECT id, nivel FROM alumnos"): por_nivel.setdefault(niv, []).append(aid)
+
+        # Ciclos de 4 semanas hacia atrás desde hoy, con la grilla completa de salones
+        lunes = hoy - timedelta(days=hoy.weekday())
+        for k in range(args.ciclos - 1, -1, -1):
+            ini = lunes - timedelta(weeks=4 * k)
+            cid = c.execute("INSERT INTO ciclos (nombre, fecha_inicio) VALUES (?,?)", (f"Ciclo {ini:%d/%m/%Y}", ini.isoformat())).lastrowid
+            c.executemany("INSERT INTO horarios (ciclo_id, grupo, hora_inicio, nivel_salon, capacidad) VALUES (?,?,?,?,?)",
+                          [(cid, g, h, n, rnd.randint(args.capacidad // 2, args.capacidad))
+                           for g in config.DIAS for h in config.HORAS for n in config.NIVELES])
+        ciclos.regenerar_calendario(c)
+
+        # Matrículas: cada salón entre 60% y 100% lleno, un alumno a lo sumo una vez por ciclo
+        salones = c.execute("SELECT id, ciclo_id, grupo, nivel_salon, capacidad FROM horarios ORDER BY id").fetchall()
+        fechas = {}
+        for cid, grupo, f in c.execute("SELECT ciclo_id, grupo, fecha FROM clase_fechas ORDER BY fecha"):
+            fechas.setdefault((cid, grupo), []).append(f)
+        ini_ciclo = dict(c.execute("SELECT id, fecha_inicio FROM ciclos"))
+        mats, usados, ciclo_act = [], set(), None
+        for hid, cid, grupo, niv, cap in salones:
+            if cid != ciclo_act: usados, ciclo_act = set(), cid
+            libres = [a for a in rnd.sample(por_nivel[niv], min(len(por_nivel[niv]), cap * 3)) if a not in usados]
+            for aid in libres[:rnd.randint(cap * 6 // 10, cap)]:
+                usados.add(aid)
+                mats.append((aid, hid, cid, grupo))
+        lotes(((aid, hid, ini_ciclo[cid]) for aid, hid, cid, _ in mats), c,
+              "INSERT INTO matriculas (alumno_id, horario_id, fecha_registro) VALUES (?,?,?)")
+
+        # Asistencia de las clases ya dictadas: 80% presente, 12% falta, 8% justificado
+        tope = hoy.isoformat()
+        def asistencias():
+            for aid, hid, cid, grupo in mats:
+                for f in fechas[(cid, grupo)]:
+                    if f > tope: break
+                    r = rnd.random()
+                    yield aid, hid, f, "Presente" if r < 0.8 else ("Falta" if r < 0.92 else "Justificado")
+        lotes(asistencias(), c, "INSERT INTO asistencia (alumno_id, horario_id, fecha, estado) VALUES (?,?,?,?)")
+
+        # Recuperaciones para la mitad de las justificadas, en un salón del mismo nivel y ciclo
+        destinos = {}
+        for hid, cid, grupo, niv, _ in salones: destinos.setdefault((cid, niv), []).append((hid, grupo))
+        justificadas = c.execute("""SELECT s.alumno_id, s.fecha, h.ciclo_id, h.nivel_salon FROM asistencia s
+                                    JOIN horarios h ON h.id = s.horario_id WHERE s.estado = 'Justificado'""").fetchall()
+        def recups():
+            for aid, f, cid, niv in justificadas:
+                if rnd.random() < 0.5: continue
+                hid, grupo = rnd.choice(destinos[(cid, niv)])
+                fd = rnd.choice(fechas[(cid, grupo)])
+                yield aid, f, hid, fd, int(fd <= tope and rnd.random() < 0.85)
+        lotes(recups(), c, "INSERT INTO recuperaciones (alumno_id, fecha_origen, horario_destino_id, fecha_destino, asistio) VALUES (?,?,?,?,?)")
+
+        dias = (hoy - (lunes - timedelta(weeks=4 * (args.ciclos - 1)))).days
+        lotes(((rnd.randint(1, args.alumnos), (hoy - timedelta(days=rnd.randrange(dias))).isoformat(), rnd.choice(DETALLES),
+                rnd.choice(GRAVEDADES)) for _ in range(args.incidentes)), c,
+              "INSERT INTO incidentes (alumno_id, fecha, detalle, gravedad) VALUES (?,?,?,?)")
+    bd.escribir(poblar, *ciclos.TABLAS_ARCHIVO, "incidentes").result()   # una sola transacción del escritor
+
+    with bd.get_pool().conexion() as conn: conn.execute("ANALYZE")
+    print(f"Sembrado en {time.perf_counter() - t0:.1f}s:")
+    for t, n in conteos().items(): print(f"  {t:<15}{n:>10,}")
+
+def conteos():
+    with bd.get_pool().conexion() as conn:
+        return {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+                for t in ("ciclos", "horarios", "alumnos", "matriculas", "asistencia", "recuperaciones", "incidentes")}
+
+def casos():
+    # Cada caso llama a la función que usa la página correspondiente de la app
+    with bd.get_pool().conexion() as conn:
+        cid = conn.execute("SELECT MAX(id) FROM ciclos").fetchone()[0]
+        hid = conn.execute("""SELECT m.horario_id FROM matriculas m JOIN horarios h ON h.id = m.horario_id
+                              WHERE h.ciclo_id = ? GROUP BY m.horario_id ORDER BY COUNT(*) DESC LIMIT 1""", (cid,)).fetchone()[0]
+        grupo = conn.execute("SELECT grupo FROM horarios WHERE id = ?", (hid,)).fetchone()[0]
+    total = (recuperaciones.pendientes_recuperacion(1) or [[0] * 8])[0][-1]
+
+    def carga_asistencia():
+        al_reg, mapa = asistencia.asistencia_salon(hid)
+        ciclos.fechas_clase(cid, grupo)
+        return al_reg, mapa
+
+    def guardado_asistencia():
+        # Reescribe la grilla completa del salón con los mismos estados (upsert sin cambio neto)
+        _, mapa = asistencia.asistencia_salon(hid)
+        asistencia.guardar_asistencia(hid, [(a, f, e, e) for (a, f), e in mapa.items()])
+
+    return {
+        "ocupacion": lambda: horarios.ocupacion_salones(cid),
+        "asistencia_carga": carga_asistencia,
+        "asistencia_guardado": guardado_asistencia,
+        "busqueda": lambda: [alumnos.buscar_alumnos(t) for t in ("mat", "quispe", "val flo", "zú")],
+        "pendientes": lambda: recuperaciones.pendientes_recuperacion(recuperaciones.PAGINA_PENDIENTES),
+        "pendientes_ultima_pagina": lambda: recuperaciones.pendientes_recuperacion(recuperaciones.PAGINA_PENDIENTES, max(total - recuperaciones.PAGINA_PENDIENTES, 0)),
+        "incidentes": incidentes.historial_incidentes,
+        "incidentes_filtrados": lambda: incidentes.historial_incidentes(gravedad="Leve", desde="2025-01-01", hasta="2025-06-30"),
+        "resumen": lambda: matriculas.resumen_matriculas(cid),
+    }
+
+def cronometrar(fn, repeticiones):
+    fn()   # calentamiento: páginas de SQLite y sentencias preparadas
+    tiempos = []
+    for _ in range(repeticiones):
+        t = time.perf_counter()
+        fn()
+        tiempos.append((time.perf_counter() - t) * 1000)
+    return statistics.median(tiempos), min(tiempos)
+
+def medir(args):
+    abrir_bd(args.dir)
+    datos = conteos()
+    if not datos["asistencia"]: sys.exit("BD vacía: ejecuta primero 'python benchmark.py sembrar'.")
+    # Sin caché de lecturas: se mide la consulta, no el acierto en memoria
+    bd.get_pool().cache = bd.CacheConsultas(ttl=0)
+    base = json.load(open(args.base, encoding="utf-8")) if os.path.exists(args.base) else {}
+    if base and base.get("datos") != datos:
+        print("Aviso: el volumen de datos no coincide con el de la línea base; la comparación es orientativa.")
+
+    resultados, regresiones = {}, []
+    print(f"{'caso':<26}{'mediana ms':>11}{'mín ms':>9}{'base mín':>10}{'Δ':>8}")
+    for nombre, fn in casos().items():
+        if args.solo and nombre not in args.solo: continue
+        med, mn = cronometrar(fn, args.repeticiones)
+        # Se compara el mínimo: es el tiempo menos afectado por el ruido de la máquina
+        resultados[nombre] = round(mn, 3)
+        ref = base.get("tiempos", {}).get(nombre)
+        delta = f"{(mn / ref - 1) * 100:+.0f}%" if ref else ""
+        # Margen absoluto para que el ruido en consultas de décimas de ms no cuente como regresión
+        if ref and mn > ref * (1 + args.tolerancia) + args.margen:
+            regresiones.append(nombre); delta += " ✗"
+        print(f"{nombre:<26}{med:>11.2f}{mn:>9.2f}{ref or 0:>10.2f}{delta:>8}")
+
+    if args.guardar:
+        tiempos = {**base.get("tiempos", {}), **resultados} if args.solo else resultados
+        json.dump({"datos": datos, "tiempos": tiempos}, open(args.base, "w", encoding="utf-8"), indent=1, ensure_ascii=False)
+        print(f"Línea base guardada en {args.base}")
+    elif regresiones:
+        print(f"Regresiones (> {args.tolerancia:.0%} + {args.margen} ms): {', '.join(regresiones)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Datos sintéticos y benchmarks de la capa de datos.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    s = sub.add_parser("sembrar", help="Crea una BD con datos sintéticos")
+    s.add_argument("--dir", default="bench", help="Directorio donde se crea la BD (debe estar vacío)")
+    s.add_argument("--ciclos", type=int, default=100)
+    s.add_argument("--alumnos", type=int, default=30000)
+    s.add_argument("--capacidad", type=int, default=20, help="Capacidad máxima por salón")
+    s.add_argument("--incidentes", type=int, default=20000)
+    # Fecha fija por defecto: la misma semilla produce siempre la misma BD que la línea base
+    s.add_argument("--hoy", default="2026-10-01", help="Fecha hasta la que hay asistencia registrada")
+    s.add_argument("--semilla", type=int, default=2026)
+    m = sub.add_parser("medir", help="Mide las consultas y compara con la línea base")
+    m.add_argument("--dir", default="bench")
+    m.add_argument("--base", default=BASE)
+    m.add_argument("--repeticiones", type=int, default=7)
+    m.add_argument("--tolerancia", type=float, default=0.25, help="Empeoramiento relativo admitido")
+    m.add_argument("--margen", type=float, default=2.0, help="Empeoramiento absoluto admitido (ms)")
+    m.add_argument("--solo", nargs="*", help="Casos a medir")
+    m.add_argument("--guardar", action="store_true", help="Guarda los tiempos como nueva línea base")
+    args = ap.parse_args()
+    args.base = os.path.abspath(args.base) if args.cmd == "medir" else None
+    {"sembrar": sembrar, "medir": medir}[args.cmd](args)
@@ -0,0 +1,14 @@
+# Capa de datos de la app (conexiones, esquema y repositorios), sin Streamlit.
+# Los submódulos se cargan recién al usarlos; pandas solo lo necesitan importacion y reportes:
+#
+#   from piscina import esquema, alumnos
+#   esquema.init_db()
+#   alumnos.buscar_alumnos("ana")
+import importlib
+
+MODULOS = ("config", "bd", "esquema", "ciclos", "horarios", "alumnos", "matriculas",
+           "asistencia", "recuperaciones", "incidentes", "importacion", "reportes")
+
+def __getattr__(nombre):
+    if nombre in MODULOS: return importlib.import_module(f".{nombre}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
@@ -0,0 +1,48 @@
+# Fichas de alumnos: búsqueda, edición y borrado
+from __future__ import annotations
+
+import json
+from typing import Iterable, NamedTuple
+
+from .bd import escritura, run_query
+
+class Alumno(NamedTuple):
+    id: int
+    nombre: str
+    apellido: str
+    telefono: str
+    direccion: str
+    nivel: str
+    apoderado: str
+    condicion: str
+
+# Búsqueda de alumnos por prefijo en nombre, apellido, apoderado y teléfono (FTS5, sin tildes)
+BUSQUEDA_MAX = 50
+
+def buscar_alumnos(texto: str, limite: int = BUSQUEDA_MAX) -> list[Alumno]:
+    terminos = [t.replace('"', "") for t in texto.split()]
+    match = " ".join(f'"{t}"*' for t in terminos if t)
+    if not match: return []
+    res = run_query("""
+        SELECT a.id, a.nombre, a.apellido, a.telefono, a.direccion, a.nivel, a.apoderado, a.condicion
+        FROM alumnos_fts f JOIN alumnos a ON a.id = f.rowid
+        WHERE alumnos_fts MATCH ?
+        ORDER BY f.rank
+        LIMIT ?
+    """, (match, limite), return_data=True, fila=Alumno)
+    return res or []
+
+def actualizar_contacto(aid: int, telefono: str, direccion: str, apoderado: str, condicion: str) -> bool:
+    return run_query("UPDATE alumnos SET telefono=?, direccion=?, apoderado=?, condicion=? WHERE id=?",
+                     (telefono, direccion, apoderado, condicion, aid))
+
+# Borrado en bloque de alumnos: ON DELETE CASCADE limpia asistencia, matrículas,
+# recuperaciones e incidentes en la misma sentencia y transacción
+@escritura("alumnos", "matriculas", "asistencia", "recuperaciones", "incidentes")
+def eliminar_alumnos(c, ids: Iterable[int]) -> int:
+    c.execute("DELETE FROM alumnos WHERE id IN (SELECT value FROM json_each(?))", (json.dumps(list(ids)),))
+    return c.rowcount
+
+# Función segura para borrar alumno y todo su rastro
+def eliminar_alumno_total(aid: int) -> bool:
+    return eliminar_alumnos([aid]) == 1
@@ -0,0 +1,44 @@
+# Grilla de asistencia de un salón
+from __future__ import annotations
+
+from typing import NamedTuple
+
+from .bd import ConflictoEdicion, escritura, run_query
+from .config import ESTADOS
+
+class AlumnoSalon(NamedTuple):
+    id: int
+    nombre: str
+    apellido: str
+    condicion: str
+
+# Matriculados del salón y {(alumno, fecha): estado}
+def asistencia_salon(hid: int) -> tuple[list[AlumnoSalon], dict]:
+    al_reg = run_query("SELECT a.id, a.nombre, a.apellido, a.condicion FROM alumnos a JOIN matriculas m ON a.id = m.alumno_id WHERE m.horario_id = ?",
+                       (hid,), return_data=True, cache=True, fila=AlumnoSalon)
+    if not al_reg: return [], {}
+    asist = run_query("SELECT alumno_id, fecha, estado FROM asistencia WHERE horario_id=?", (hid,), return_data=True, cache=True)
+    return al_reg, {(r[0], r[1]): r[2] for r in asist or []}
+
+# Control optimista: cambios = [(alumno_id, fecha, antes, despues)], con "antes" el estado que se vio
+# al cargar la grilla. Si otra sesión cambió alguna de esas celdas (no vale ni "antes" ni "despues")
+# no se guarda nada y se informa la lista [(alumno_id, fecha, actual)]. Devuelve las celdas escritas.
+@escritura("asistencia")
+def guardar_asistencia(c, hid: int, cambios: list[tuple]) -> int:
+    actual = {(a, f): e for a, f, e in c.execute("SELECT alumno_id, fecha, estado FROM asistencia WHERE horario_id=?", (hid,))}
+    conflictos = [(a, f, actual.get((a, f))) for a, f, antes, despues in cambios if actual.get((a, f)) not in (antes, despues)]
+    if conflictos: raise ConflictoEdicion(conflictos)
+    c.executemany("""INSERT INTO asistencia (alumno_id, horario_id, fecha, estado) VALUES (?,?,?,?)
+                     ON CONFLICT(alumno_id, horario_id, fecha) DO UPDATE SET estado = excluded.estado""",
+                  [(a, hid, f, despues) for a, f, _, despues in cambios if despues is not None])
+    c.executemany("DELETE FROM asistencia WHERE alumno_id=? AND horario_id=? AND fecha=?",
+                  [(a, hid, f) for a, f, _, despues in cambios if despues is None])
+    return len(cambios)
+
+# Celdas de la grilla (DataFrames con columna ID y una por fecha) que cambiaron: [(alumno_id, fecha, antes, despues)]
+def diff_asistencia(original, editado, fechas: list[str]) -> list[tuple]:
+    antes = original.melt(id_vars="ID", value_vars=fechas, var_name="fecha", value_name="antes")
+    despues = editado.melt(id_vars="ID", value_vars=fechas, var_name="fecha", value_name="valor")
+    d = despues.merge(antes, on=["ID", "fecha"], how="left")
+    d = d[d["valor"].fillna("") != d["antes"].fillna("")]
+    return [(int(a), f, ESTADOS.get(x), ESTADOS.get(y)) for a, f, y, x in d[["ID", "fecha", "valor", "antes"]].itertuples(index=False)]
@@ -0,0 +1,407 @@
+# Conexiones, caché de lecturas y medición de consultas. No depende de Streamlit:
+# la app y las herramientas de línea de comandos comparten el mismo pool por proceso.
+import hashlib
+import itertools
+import logging
+import os
+import queue
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache, wraps
+
+from .config import ARCHIVO_DB, CACHE_MAX, CACHE_TTL, DB_NAME, POOL_SIZE, PRAGMAS
+
+# Tablas mantenidas por triggers: al escribir la tabla base también cambian estas
+DERIVADAS = {
+    "alumnos": ("alumnos_fts",),
+    "asistencia": ("resumen_asistencia",),
+    "recuperaciones": ("resumen_asistencia",),
+    "matriculas": ("resumen_asistencia",),
+}
+
+RE_LECTURA = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)", re.I)
+RE_ESCRITURA = re.compile(r"^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+(\w+)", re.I)
+
+@lru_cache(maxsize=1024)
+def tablas_leidas(query):
+    return frozenset(t.lower() for t in RE_LECTURA.findall(query))
+
+@lru_cache(maxsize=1024)
+def tabla_escrita(query):
+    m = RE_ESCRITURA.match(query)
+    return m.group(1).lower() if m else None
+
+class CacheConsultas:
+    # Resultados de lecturas con TTL, desalojo LRU e invalidación por tabla.
+    # Cada tabla tiene una versión que sube con cada escritura; una entrada es válida
+    # mientras las versiones de las tablas que leyó no hayan cambiado.
+    def __init__(self, ttl=CACHE_TTL, maximo=CACHE_MAX):
+        self.ttl, self.maximo = ttl, maximo
+        self.datos = OrderedDict()   # clave -> (expira, versiones, filas)
+        self.versiones = {}          # tabla -> nº de escrituras
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.desalojos = self.invalidaciones = 0
+
+    def obtener(self, clave, tablas):
+        # Devuelve (filas o None, versiones actuales para guardar el resultado luego)
+        with self.lock:
+            actuales = {t: self.versiones.get(t, 0) for t in tablas}
+            e = self.datos.get(clave)
+            if e and e[0] > time.monotonic() and e[1] == actuales:
+                self.datos.move_to_end(clave)
+                self.hits += 1
+                return e[2], actuales
+            if e: del self.datos[clave]
+            self.misses += 1
+            return None, actuales
+
+    def guardar(self, clave, versiones, filas):
+        with self.lock:
+            # Si hubo una escritura mientras se leía, no se guarda un resultado viejo
+            if any(self.versiones.get(t, 0) != v for t, v in versiones.items()): return
+            self.datos[clave] = (time.monotonic() + self.ttl, versiones, filas)
+            self.datos.move_to_end(clave)
+            while len(self.datos) > self.maximo:
+                self.datos.popitem(last=False)
+                self.desalojos += 1
+
+    def invalidar(self, *tablas):
+        with self.lock:
+            for t in tablas:
+                if not t: continue
+                for tt in (t.lower(),) + DERIVADAS.get(t.lower(), ()):
+                    self.versiones[tt] = self.versiones.get(tt, 0) + 1
+            self.invalidaciones += 1
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {"entradas": len(self.datos), "hits": self.hits, "misses": self.misses,
+                    "ratio": round(self.hits / total, 3) if total else 0.0,
+                    "desalojos": self.desalojos, "invalidaciones": self.invalidaciones}
+
+# ---- Medición de consultas ----
+# Todas las conexiones usan ConexionMedida: cuando el perfilador está activo, cada sentencia
+# se registra (texto, huella de parámetros, duración, filas y línea de origen) en el rerun
+# que la ejecutó. Inactivo, el costo es una comparación por sentencia.
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UMBRAL_N1 = 5   # misma sentencia más veces que esto en un rerun = posible N+1
+
+def origen_llamada():
+    # Primera línea del proyecto fuera de este módulo que llevó a la consulta (repositorio o página)
+    f = sys._getframe(2)
+    while f is not None:
+        archivo = f.f_code.co_filename
+        if archivo != __file__ and archivo.startswith(RAIZ):
+            return f"{os.path.basename(archivo)}:{f.f_code.co_name}:{f.f_lineno}"
+        f = f.f_back
+    return "?"
+
+class Perfilador:
+    def __init__(self, max_reruns=50):
+        self.activo = False
+        self.reruns = deque(maxlen=max_reruns)
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+
+    def iniciar(self, pagina):
+        # Se llama al comienzo de cada rerun, con la página elegida en el menú
+        self.local.rerun = None
+        if not self.activo: return
+        r = {"rerun": next(self.ids), "pagina": pagina, "inicio": datetime.now().isoformat(timespec="seconds"), "consultas": []}
+        self.local.rerun = r
+        with self.lock: self.reruns.append(r)
+
+    def registrar(self, sql, params, ms, filas):
+        r = getattr(self.local, "rerun", None)
+        if r is None: return None
+        forma = sorted(params) if isinstance(params, dict) else len(params or ())
+        reg = {"sql": " ".join(sql.split()), "huella": hashlib.sha1(repr(params).encode()).hexdigest()[:10],
+               "forma": forma, "ms": ms, "filas": filas, "origen": origen_llamada()}
+        r["consultas"].append(reg)
+        return reg
+
+    def datos(self):
+        with self.lock: return list(self.reruns)
+
+    def limpiar(self):
+        with self.lock: self.reruns.clear()
+
+class CursorMedido(sqlite3.Cursor):
+    reg = None
+
+    def execute(self, sql, params=()):
+        perfil = self.connection.perfil
+        if not (perfil and perfil.activo): return super().execute(sql, params)
+        t = time.perf_counter()
+        res = super().execute(sql, params)
+        self.reg = perfil.registrar(sql, params, (time.perf_counter() - t) * 1000, max(self.rowcount, 0))
+        return res
+
+    def executemany(self, sql, seq_params):
+        perfil = self.connection.perfil
+        if not (perfil and perfil.activo): return super().executemany(sql, seq_params)
+        t = time.perf_counter()
+        res = super().executemany(sql, seq_params)
+        self.reg = perfil.registrar(sql, (), (time.perf_counter() - t) * 1000, max(self.rowcount, 0))
+        return res
+
+    def _medir_fetch(self, fetch, *args):
+        if self.reg is None: return fetch(*args)
+        t = time.perf_counter()
+        filas = fetch(*args)
+        self.reg["ms"] += (time.perf_counter() - t) * 1000
+        self.reg["filas"] += len(filas) if isinstance(filas, list) else int(filas is not None)
+        return filas
+
+    def fetchall(self): return self._medir_fetch(super().fetchall)
+    def fetchmany(self, size=1): return self._medir_fetch(super().fetchmany, size)
+    def fetchone(self): return self._medir_fetch(super().fetchone)
+
+class ConexionMedida(sqlite3.Connection):
+    perfil = None
+    # Connection.execute nativo no pasa por cursor(); se redirige para poder medir
+    def cursor(self, factory=None): return super().cursor(factory or CursorMedido)
+    def execute(self, sql, params=()): return self.cursor().execute(sql, params)
+    def executemany(self, sql, seq_params): return self.cursor().executemany(sql, seq_params)
+
+@lru_cache(maxsize=None)
+def get_perfil():
+    return Perfilador()
+
+class PoolBD:
+    # Conexiones SQLite reutilizables entre reruns, sesiones e hilos del servidor
+    def __init__(self, ruta, tamano=POOL_SIZE):
+        self.ruta = ruta
+        self.libres = queue.LifoQueue()
+        self.cache = CacheConsultas()
+        self._escritor, self.lock_escritor = None, threading.Lock()
+        for _ in range(tamano): self.libres.put(self._abrir())
+
+    def _abrir(self):
+        # isolation_level=None: autocommit por sentencia, transacciones explícitas con BEGIN
+        # cached_statements: reutiliza las sentencias preparadas de cada conexión
+        conn = sqlite3.connect(self.ruta, check_same_thread=False, isolation_level=None, cached_statements=256, factory=ConexionMedida)
+        conn.perfil = get_perfil()
+        for p in PRAGMAS: conn.execute(p)
+        return conn
+
+    @contextmanager
+    def conexion(self):
+        conn = self.libres.get()
+        try: yield conn
+        finally: self.libres.put(conn)
+
+    @property
+    def escritor(self):
+        # Se crea con la primera escritura (las herramientas de solo lectura no levantan el hilo)
+        with self.lock_escritor:
+            if self._escritor is None: self._escritor = EscritorBD(self)
+            return self._escritor
+
+# ---- Escritura serializada ----
+# Todas las escrituras pasan por un único hilo con su propia conexión. Los trabajos (funciones
+# que reciben el cursor) se encolan desde cualquier sesión; el escritor toma los que estén
+# esperando y los confirma juntos en una transacción, cada uno en su SAVEPOINT para que el
+# error de uno no deshaga a los demás. Si la base está ocupada (otro proceso), reintenta el
+# grupo completo con espera exponencial. Quien encola recibe un Future con el resultado.
+ESCRITURA_COLA = 256        # trabajos en espera como máximo
+ESCRITURA_ESPERA = 10       # s que se espera un lugar en la cola llena antes de rendirse
+ESCRITURA_LOTE = 64         # trabajos por transacción
+REINTENTOS = 6
+ESPERA_BASE = 0.05          # s; se duplica en cada reintento, con jitter
+
+class ConflictoEdicion(Exception):
+    # Control optimista: los datos cambiaron desde que se leyeron; no se guardó nada
+    def __init__(self, conflictos):
+        super().__init__(f"{len(conflictos)} cambios en conflicto con otra sesión")
+        self.conflictos = conflictos
+
+def ocupada(e):
+    return isinstance(e, sqlite3.OperationalError) and ("locked" in str(e) or "busy" in str(e))
+
+class Trabajo:
+    __slots__ = ("fn", "tablas", "archivo", "transaccion", "futuro", "rerun")
+
+    def __init__(self, fn, tablas, archivo, transaccion):
+        self.fn, self.tablas, self.archivo, self.transaccion = fn, tablas, archivo, transaccion
+        self.futuro = Future()
+        self.rerun = getattr(get_perfil().local, "rerun", None)   # para atribuir sus consultas al perfilar
+
+class EscritorBD:
+    def __init__(self, pool):
+        self.pool = pool
+        self.cola = queue.Queue(maxsize=ESCRITURA_COLA)
+        self.conn = pool._abrir()
+        self.trabajos = self.transacciones = self.reintentos = self.fallidos = self.conflictos = 0
+        self.hilo = threading.Thread(target=self._bucle, name="escritor-bd", daemon=True)
+        self.hilo.start()
+
+    def enviar(self, fn, tablas=(), archivo=None, transaccion=True):
+        # archivo: base adjunta como "archivo"; transaccion=False: sentencias que no la admiten (VACUUM).
+        # Ambos casos se ejecutan solos, fuera de los grupos.
+        if threading.current_thread() is self.hilo:
+            raise RuntimeError("Escritura encolada desde el propio escritor (usar el cursor recibido)")
+        t = Trabajo(fn, tablas, archivo, transaccion)
+        try: self.cola.put(t, timeout=ESCRITURA_ESPERA)
+        except queue.Full: raise sqlite3.OperationalError("database is busy: cola de escritura llena") from None
+        return t.futuro
+
+    def stats(self):
+        return {"en_cola": self.cola.qsize(), "trabajos": self.trabajos, "transacciones": self.transacciones,
+                "reintentos": self.reintentos, "fallidos": self.fallidos, "conflictos": self.conflictos}
+
+    def _bucle(self):
+        while True:
+            # Sin ventana de espera: se agrupa lo que se acumuló mientras corría la transacción anterior
+            grupo = [self.cola.get()]
+            while len(grupo) < ESCRITURA_LOTE:
+                try: grupo.append(self.cola.get_nowait())
+                except queue.Empty: break
+            grupo = [t for t in grupo if t.futuro.set_running_or_notify_cancel()]
+            normales = [t for t in grupo if t.transaccion and not t.archivo]
+            if normales: self._ejecutar(normales)
+            for t in grupo:
+                if t not in normales: self._ejecutar([t])
+
+    def _ejecutar(self, grupo):
+        conn, perfil = self.conn, get_perfil()
+        archivo, en_tx = grupo[0].archivo, grupo[0].transaccion
+        for intento in range(REINTENTOS):
+            resultados = []
+            try:
+                if archivo: conn.execute("ATTACH DATABASE ? AS archivo", (archivo,))
+                try:
+                    if en_tx: conn.execute("BEGIN IMMEDIATE")
+                    c = conn.cursor()
+                    for t in grupo:
+                        if en_tx: c.execute("SAVEPOINT trabajo")
+                        try:
+                            # Solo las sentencias del trabajo cuentan para el rerun que lo encoló
+                            perfil.local.rerun = t.rerun
+                            try: r = t.fn(c)
+                            finally: perfil.local.rerun = None
+                        except Exception as e:
+                            if ocupada(e): raise
+                            if en_tx: c.execute("ROLLBACK TO trabajo")
+                            resultados.append((t, None, e))
+                        else: resultados.append((t, r, None))
+                        finally:
+                            if en_tx: c.execute("RELEASE trabajo")
+                    if en_tx: conn.execute("COMMIT")
+                finally:
+                    if conn.in_transaction: conn.execute("ROLLBACK")
+                    if archivo: conn.execute("DETACH DATABASE archivo")
+            except Exception as e:
+                if ocupada(e) and intento < REINTENTOS - 1:
+                    self.reintentos += 1
+                    time.sleep(ESPERA_BASE * 2 ** intento * (0.5 + random.random()))
+                    continue
+                self.fallidos += len(grupo)
+                for t in grupo: t.futuro.set_exception(e)
+                return
+            break
+        self.transacciones += 1
+        self.trabajos += len(grupo)
+        self.conflictos += sum(isinstance(e, ConflictoEdicion) for _, _, e in resultados)
+        self.pool.cache.invalidar(*{tb for t, _, e in resultados if e is None for tb in t.tablas})
+        for t, r, e in resultados:
+            if e is None: t.futuro.set_result(r)
+            else: t.futuro.set_exception(e)
+
+class ArchivoBD:
+    # Lectura del histórico: la base de archivo como principal y la viva adjunta (solo lectura).
+    # Las mismas consultas de reportes sirven para ciclos archivados; lo que no se archiva
+    # (incidentes, feriados) se resuelve en la base viva.
+    def __init__(self, ruta=ARCHIVO_DB, viva=DB_NAME):
+        self.ruta, self.viva = ruta, viva
+
+    def existe(self):
+        return os.path.exists(self.ruta)
+
+    @contextmanager
+    def conexion(self):
+        conn = sqlite3.connect(f"file:{self.ruta}?mode=ro", uri=True, factory=ConexionMedida)
+        conn.perfil = get_perfil()
+        try:
+            conn.execute("ATTACH DATABASE ? AS vivo", (f"file:{self.viva}?mode=ro",))
+            yield conn
+        finally: conn.close()
+
+# Un pool por proceso (el servidor de Streamlit comparte el suyo entre sesiones)
+@lru_cache(maxsize=None)
+def get_pool():
+    return PoolBD(DB_NAME)
+
+def escribir(fn, *tablas, archivo=None, transaccion=True):
+    # Encola fn(cursor) en el escritor; tablas: las que escribe, para invalidar la caché al confirmar
+    return get_pool().escritor.enviar(fn, tablas, archivo, transaccion)
+
+def escritura(*tablas):
+    # Decorador para funciones de escritura que reciben el cursor como primer argumento:
+    # f(...) encola y espera el resultado; f.enviar(...) devuelve el Future sin esperar.
+    def decorar(fn):
+        @wraps(fn)
+        def esperar(*args, **kwargs):
+            return escribir(lambda c: fn(c, *args, **kwargs), *tablas).result()
+        esperar.enviar = lambda *args, **kwargs: escribir(lambda c: fn(c, *args, **kwargs), *tablas)
+        return esperar
+    return decorar
+
+# Destino de los errores de run_query / run_many; la app lo reemplaza por st.error
+avisar = logging.getLogger("piscina").error
+
+def run_query(query, params=(), return_data=False, cache=False, fila=None):
+    # cache=True: lecturas de datos que cambian poco (ciclos, horarios, listados)
+    # fila: NamedTuple en que se convierte cada fila (se cachea ya convertida)
+    pool = get_pool()
+    if return_data and cache:
+        clave = (query, tuple(params), fila)
+        filas, versiones = pool.cache.obtener(clave, tablas_leidas(query))
+        if filas is not None: return list(filas)
+    try:
+        if not return_data:
+            escribir(lambda c: c.execute(query, params), tabla_escrita(query)).result()
+            return True
+        with pool.conexion() as conn:
+            filas = conn.execute(query, params).fetchall()
+        if fila: filas = list(map(fila._make, filas))
+        if cache: pool.cache.guardar(clave, versiones, filas)
+        return list(filas)
+    except Exception as e:
+        avisar(f"Error BD: {e}")
+        return False
+
+def run_many(query, seq_params):
+    # Misma sentencia para muchas filas en una sola transacción
+    try:
+        escribir(lambda c: c.executemany(query, seq_params), tabla_escrita(query)).result()
+        return True
+    except Exception as e:
+        avisar(f"Error BD: {e}")
+        return False
+
+def compactar():
+    # VACUUM no puede ir dentro de una transacción: el escritor lo ejecuta solo, fuera de los grupos
+    try:
+        escribir(lambda c: c.execute("VACUUM"), transaccion=False).result()
+        return True
+    except Exception as e:
+        avisar(f"Error BD: {e}")
+        return False
+
+def explicar(sql, forma):
+    # EXPLAIN QUERY PLAN con parámetros ficticios (el plan no depende de los valores).
+    # forma: cantidad de parámetros o lista de nombres, como la registra el perfilador
+    params = {k: None for k in forma} if isinstance(forma, list) else (None,) * forma
+    with get_pool().conexion() as conn:
+        return conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
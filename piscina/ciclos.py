@@ -0,0 +1,146 @@
+# Ciclos, su calendario de clases y feriados; borrado y archivo de ciclos completos
+from __future__ import annotations
+
+import re
+from datetime import date, datetime, timedelta
+from typing import Iterable, NamedTuple
+
+from . import bd
+from .bd import escribir, escritura, run_query
+from .config import ARCHIVO_DB, CLASES_META, DIAS
+
+class Ciclo(NamedTuple):
+    id: int
+    nombre: str
+    fecha_inicio: str
+
+class Feriado(NamedTuple):
+    fecha: str
+    motivo: str
+
+def listar_ciclos(pool=None) -> list[Ciclo]:
+    # pool: ArchivoBD en vez de la base viva, sin caché. El archivo guarda como referencia ciclos
+    # que siguen vivos (salones destino de recuperaciones); solo se listan los ya archivados.
+    if pool is None: return run_query("SELECT id, nombre, fecha_inicio FROM ciclos ORDER BY id DESC", return_data=True, cache=True, fila=Ciclo) or []
+    with pool.conexion() as conn:
+        return [Ciclo._make(r) for r in conn.execute("SELECT id, nombre, fecha_inicio FROM ciclos WHERE id NOT IN (SELECT id FROM vivo.ciclos) ORDER BY id DESC")]
+
+@escritura("ciclos", "clase_fechas")
+def crear_ciclo(c, nombre: str, fecha_inicio) -> int:
+    c.execute("INSERT INTO ciclos (nombre, fecha_inicio) VALUES (?, ?)", (nombre, str(fecha_inicio)))
+    cid = c.lastrowid
+    regenerar_calendario(c, [cid])
+    return cid
+
+def generar_fechas_clase(fecha_inicio_str, grupo: str, feriados=()) -> list[str]:
+    fechas = []
+    try:
+        if isinstance(fecha_inicio_str, str): curr = datetime.strptime(fecha_inicio_str, "%Y-%m-%d").date()
+        else: curr = fecha_inicio_str
+    except: curr = date.today()
+
+    target = [0, 2, 4] if "Lunes" in grupo else [1, 3, 5]
+    while curr.weekday() not in target: curr += timedelta(days=1)
+    while len(fechas) < CLASES_META:
+        if curr.weekday() in target:
+            f = curr.strftime("%Y-%m-%d")
+            if f not in feriados: fechas.append(f)   # un feriado corre la sesión a la siguiente fecha
+        curr += timedelta(days=1)
+    return fechas
+
+# Regenera clase_fechas (todas o algunas) dentro de la transacción del cursor c.
+# Se llama al crear un ciclo y al cambiar feriados; el resto solo lee la tabla.
+def regenerar_calendario(c, ciclo_ids: Iterable[int] | None = None):
+    feriados = {r[0] for r in c.execute("SELECT fecha FROM feriados")}
+    ciclos = c.execute("SELECT id, fecha_inicio FROM ciclos").fetchall()
+    if ciclo_ids is not None: ciclos = [x for x in ciclos if x[0] in set(ciclo_ids)]
+    c.executemany("DELETE FROM clase_fechas WHERE ciclo_id=?", [(cid,) for cid, _ in ciclos])
+    c.executemany("INSERT INTO clase_fechas (ciclo_id, grupo, n, fecha) VALUES (?,?,?,?)",
+                  [(cid, g, n, f) for cid, ini in ciclos for g in DIAS for n, f in enumerate(generar_fechas_clase(ini, g, feriados), 1)])
+
+def fechas_clase(ciclo_id: int, grupo: str) -> list[str]:
+    res = run_query("SELECT fecha FROM clase_fechas WHERE ciclo_id=? AND grupo=? ORDER BY n", (ciclo_id, grupo), return_data=True, cache=True)
+    if not res:
+        # Ciclo cargado por fuera de la app: se genera su calendario una vez
+        escribir(lambda c: regenerar_calendario(c, [ciclo_id]), "clase_fechas").result()
+        res = run_query("SELECT fecha FROM clase_fechas WHERE ciclo_id=? AND grupo=? ORDER BY n", (ciclo_id, grupo), return_data=True, cache=True)
+    return [r[0] for r in res or []]
+
+
+def listar_feriados() -> list[Feriado]:
+    return run_query("SELECT fecha, motivo FROM feriados ORDER BY fecha DESC", return_data=True, cache=True, fila=Feriado) or []
+
+# Ciclos cuyo calendario (del inicio a la última sesión) incluye la fecha
+def ciclos_en_fecha(c, fecha) -> list[int]:
+    return [r[0] for r in c.execute("""SELECT ci.id FROM ciclos ci JOIN clase_fechas cf ON cf.ciclo_id = ci.id
+                                       GROUP BY ci.id HAVING ? BETWEEN ci.fecha_inicio AND MAX(cf.fecha)""", (str(fecha),))]
+
+# Agregar o quitar un feriado corre las sesiones de los ciclos que lo abarcan; el resto no se toca
+@escritura("feriados", "clase_fechas")
+def agregar_feriado(c, fecha, motivo: str):
+    ids = ciclos_en_fecha(c, fecha)
+    c.execute("INSERT OR REPLACE INTO feriados (fecha, motivo) VALUES (?, ?)", (str(fecha), motivo))
+    regenerar_calendario(c, ids)
+
+@escritura("feriados", "clase_fechas")
+def quitar_feriado(c, fecha):
+    ids = ciclos_en_fecha(c, fecha)
+    c.execute("DELETE FROM feriados WHERE fecha=?", (str(fecha),))
+    regenerar_calendario(c, ids)
+
+# Elimina un ciclo completo y todo lo que cuelga de él en una sola transacción:
+# matrículas, salones (y por cascada su asistencia) y el calendario.
+# Los alumnos se conservan.
+TABLAS_CICLO = ("ciclos", "horarios", "matriculas", "asistencia", "recuperaciones", "clase_fechas")
+
+def borrar_ciclo(c, ciclo_id: int) -> int:
+    # Recuperaciones de faltas de este ciclo agendadas en salones de otro ciclo
+    c.execute("""DELETE FROM main.recuperaciones WHERE (alumno_id, fecha_origen) IN (
+                     SELECT s.alumno_id, s.fecha FROM main.asistencia s JOIN main.horarios h ON h.id = s.horario_id
+                     WHERE h.ciclo_id = ? AND s.estado = 'Justificado')""", (ciclo_id,))
+    # Visitantes de otros ciclos en estos salones: las asistidas se conservan (el destino queda en NULL
+    # por la llave foránea); las no asistidas ya no pueden hacerse y la falta vuelve a quedar pendiente
+    c.execute("""DELETE FROM main.recuperaciones WHERE NOT asistio
+                     AND horario_destino_id IN (SELECT id FROM main.horarios WHERE ciclo_id = ?)""", (ciclo_id,))
+    c.execute("DELETE FROM main.matriculas WHERE horario_id IN (SELECT id FROM main.horarios WHERE ciclo_id = ?)", (ciclo_id,))
+    c.execute("DELETE FROM main.ciclos WHERE id = ?", (ciclo_id,))
+    return c.rowcount
+
+purgar_ciclo = escritura(*TABLAS_CICLO)(borrar_ciclo)
+
+# Archivo de ciclos cerrados: copia el ciclo (y los alumnos involucrados) a ARCHIVO_DB y lo
+# borra de la base viva. Con WAL la transacción no es atómica entre ambas bases, pero las
+# copias son idempotentes: si se corta a mitad, basta con volver a archivar el ciclo.
+# Las recuperaciones cruzan ciclos: para que sus llaves foráneas valgan también en el archivo
+# se copian los salones destino de otros ciclos (con su fila de ciclo) y los alumnos visitantes.
+TABLAS_ARCHIVO = ["ciclos", "alumnos", "horarios", "matriculas", "asistencia", "recuperaciones", "clase_fechas", "resumen_asistencia"]
+
+def archivar_ciclo(ciclo_id: int, ruta: str = ARCHIVO_DB, compactar: bool = False):
+    recups = """horario_destino_id IN (SELECT id FROM main.horarios WHERE ciclo_id = :c)
+                OR (alumno_id, fecha_origen) IN (SELECT s.alumno_id, s.fecha FROM main.asistencia s
+                    JOIN main.horarios h ON h.id = s.horario_id WHERE h.ciclo_id = :c AND s.estado = 'Justificado')"""
+    destinos = f"SELECT horario_destino_id FROM main.recuperaciones WHERE {recups}"
+    filtros = {
+        "ciclos": f"id = :c OR id IN (SELECT ciclo_id FROM main.horarios WHERE id IN ({destinos}))",
+        "alumnos": f"""id IN (SELECT alumno_id FROM main.matriculas WHERE horario_id IN (SELECT id FROM main.horarios WHERE ciclo_id = :c))
+                       OR id IN (SELECT alumno_id FROM main.recuperaciones WHERE {recups})""",
+        "horarios": f"ciclo_id = :c OR id IN ({destinos})",
+        "matriculas": "horario_id IN (SELECT id FROM main.horarios WHERE ciclo_id = :c)",
+        "asistencia": "horario_id IN (SELECT id FROM main.horarios WHERE ciclo_id = :c)",
+        "recuperaciones": recups,
+        "clase_fechas": "ciclo_id = :c",
+        "resumen_asistencia": "horario_id IN (SELECT id FROM main.horarios WHERE ciclo_id = :c)",
+    }
+    def copiar(c):
+        for t in TABLAS_ARCHIVO:
+            ddl = c.execute("SELECT sql FROM main.sqlite_schema WHERE type = 'table' AND name = ?", (t,)).fetchone()[0]
+            c.execute(re.sub(r'^CREATE TABLE "?\w+"?', f"CREATE TABLE IF NOT EXISTS archivo.{t}", ddl))
+            cols = [r[1] for r in c.execute(f"PRAGMA main.table_info({t})")]
+            sql = f"INSERT INTO archivo.{t} ({', '.join(cols)}) SELECT {', '.join(cols)} FROM main.{t} WHERE {filtros[t]}"
+            if t == "alumnos":   # ficha más reciente del alumno (UPSERT: REPLACE borraría su historial archivado)
+                sql += " ON CONFLICT(id) DO UPDATE SET " + ", ".join(f"{col} = excluded.{col}" for col in cols[1:])
+            else: sql = sql.replace("INSERT INTO", "INSERT OR IGNORE INTO", 1)
+            c.execute(sql, {"c": ciclo_id})
+        return borrar_ciclo(c, ciclo_id)
+    escribir(copiar, *TABLAS_CICLO, archivo=ruta).result()
+    if compactar: bd.compactar()
@@ -0,0 +1,26 @@
+# Constantes compartidas por la app y las herramientas de línea de comandos
+DB_NAME = "piscina_v14_gestion.db"
+ARCHIVO_DB = "piscina_v14_archivo.db"   # ciclos cerrados (se adjunta con ATTACH)
+
+# Listas de referencia
+DIAS = ["Lunes-Miércoles-Viernes", "Martes-Jueves-Sábado"]
+HORAS = ["07:00-08:00", "08:00-09:00", "09:00-10:00", "10:00-11:00", 
+         "11:00-12:00", "12:00-13:00", "15:00-16:00", "16:00-17:00", 
+         "17:00-18:00", "18:00-19:00"]
+NIVELES = ["Básico 0", "Básico 1", "Básico 2", "Intermedio", "Avanzado"]
+ESTADOS = {"✅": "Presente", "❌": "Falta", "🤧": "Justificado"}
+CLASES_META = 12   # clases por matrícula
+
+# Pragmas aplicados a cada conexión del pool
+PRAGMAS = [
+    "PRAGMA journal_mode = WAL",      # lectores no bloquean al escritor
+    "PRAGMA synchronous = NORMAL",    # seguro con WAL y mucho más rápido que FULL
+    "PRAGMA cache_size = -16000",     # ~16 MB de caché de páginas
+    "PRAGMA mmap_size = 67108864",    # 64 MB mapeados en memoria
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA foreign_keys = ON",
+]
+POOL_SIZE = 4
+CACHE_TTL = 300    # segundos que vive una lectura cacheada
+CACHE_MAX = 512    # máximo de resultados en memoria (LRU)
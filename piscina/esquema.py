@@ -0,0 +1,314 @@
+# Esquema versionado de la base viva
+import sqlite3
+from datetime import datetime
+from functools import lru_cache
+
+from .bd import get_pool
+from .ciclos import regenerar_calendario
+
+# Recuperaciones asistidas de la falta justificada de una fila de asistencia ({0}: new u old)
+RECUPERADAS = """CASE WHEN {0}.estado = 'Justificado' THEN (SELECT COUNT(*) FROM recuperaciones r
+                     WHERE r.alumno_id = {0}.alumno_id AND r.fecha_origen = {0}.fecha AND r.asistio) ELSE 0 END"""
+
+# Matrículas a las que acredita una recuperación ({0}: new u old): todas las que tienen una falta
+# justificada del alumno en la fecha de origen (el mismo criterio que RECUPERADAS)
+ORIGEN_RECUPERACION = """(alumno_id, horario_id) IN (SELECT alumno_id, horario_id FROM asistencia
+                     WHERE alumno_id = {0}.alumno_id AND fecha = {0}.fecha_origen AND estado = 'Justificado')"""
+
+# Recálculo completo de "recuperadas" (carga inicial y corrección de datos desfasados)
+RECALCULO_RECUPERADAS = """UPDATE resumen_asistencia SET recuperadas = (
+               SELECT COUNT(*) FROM recuperaciones r JOIN asistencia s
+                   ON s.alumno_id = r.alumno_id AND s.fecha = r.fecha_origen AND s.estado = 'Justificado'
+               WHERE r.asistio AND s.alumno_id = resumen_asistencia.alumno_id AND s.horario_id = resumen_asistencia.horario_id)"""
+
+# Migraciones versionadas: (versión, sentencias). Solo se agregan al final, nunca se editan.
+MIGRACIONES = [
+    (1, [
+        # Tablas Base
+        '''CREATE TABLE IF NOT EXISTS ciclos (id INTEGER PRIMARY KEY AUTOINCREMENT, nombre TEXT, fecha_inicio DATE)''',
+        '''CREATE TABLE IF NOT EXISTS horarios (id INTEGER PRIMARY KEY AUTOINCREMENT, ciclo_id INTEGER, grupo TEXT, hora_inicio TEXT, nivel_salon TEXT, capacidad INTEGER, FOREIGN KEY(ciclo_id) REFERENCES ciclos(id))''',
+        '''CREATE TABLE IF NOT EXISTS alumnos (id INTEGER PRIMARY KEY AUTOINCREMENT, nombre TEXT, apellido TEXT, telefono TEXT, direccion TEXT, nivel TEXT, apoderado TEXT, condicion TEXT)''',
+        '''CREATE TABLE IF NOT EXISTS matriculas (id INTEGER PRIMARY KEY AUTOINCREMENT, alumno_id INTEGER, horario_id INTEGER, fecha_registro DATE, FOREIGN KEY(alumno_id) REFERENCES alumnos(id), FOREIGN KEY(horario_id) REFERENCES horarios(id))''',
+        '''CREATE TABLE IF NOT EXISTS asistencia (id INTEGER PRIMARY KEY AUTOINCREMENT, alumno_id INTEGER, horario_id INTEGER, fecha TEXT, estado TEXT, UNIQUE(alumno_id, horario_id, fecha))''',
+        # Tabla Recuperaciones (Visitantes)
+        '''CREATE TABLE IF NOT EXISTS recuperaciones (
+                 id INTEGER PRIMARY KEY AUTOINCREMENT, 
+                 alumno_id INTEGER, 
+                 fecha_origen TEXT, 
+                 horario_destino_id INTEGER, 
+                 fecha_destino TEXT, 
+                 asistio BOOLEAN DEFAULT 0)''',
+        # Tabla Incidentes
+        '''CREATE TABLE IF NOT EXISTS incidentes (
+                 id INTEGER PRIMARY KEY AUTOINCREMENT, 
+                 alumno_id INTEGER, 
+                 fecha DATE, 
+                 detalle TEXT, 
+                 gravedad TEXT)''',
+    ]),
+    (2, [
+        # Índices para las búsquedas frecuentes (cubren las columnas leídas)
+        "CREATE INDEX IF NOT EXISTS idx_horarios_slot ON horarios(ciclo_id, grupo, hora_inicio, nivel_salon, capacidad)",
+        "CREATE INDEX IF NOT EXISTS idx_matriculas_horario ON matriculas(horario_id, alumno_id)",
+        "CREATE INDEX IF NOT EXISTS idx_matriculas_alumno ON matriculas(alumno_id)",
+        "CREATE INDEX IF NOT EXISTS idx_asistencia_horario ON asistencia(horario_id, alumno_id, fecha, estado)",
+        "CREATE INDEX IF NOT EXISTS idx_asistencia_justificado ON asistencia(alumno_id, fecha) WHERE estado = 'Justificado'",
+        "CREATE INDEX IF NOT EXISTS idx_recuperaciones_destino ON recuperaciones(horario_destino_id, fecha_destino)",
+        "CREATE INDEX IF NOT EXISTS idx_recuperaciones_origen ON recuperaciones(alumno_id, fecha_origen)",
+        "CREATE INDEX IF NOT EXISTS idx_incidentes_alumno ON incidentes(alumno_id)",
+        "ANALYZE",
+    ]),
+    (3, [
+        # Índice de texto completo para buscar alumnos (sin tildes, por prefijo)
+        """CREATE VIRTUAL TABLE IF NOT EXISTS alumnos_fts USING fts5(
+                 nombre, apellido, apoderado, telefono,
+                 content='alumnos', content_rowid='id',
+                 tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+        """CREATE TRIGGER IF NOT EXISTS alumnos_fts_ai AFTER INSERT ON alumnos BEGIN
+                 INSERT INTO alumnos_fts(rowid, nombre, apellido, apoderado, telefono) VALUES (new.id, new.nombre, new.apellido, new.apoderado, new.telefono);
+             END""",
+        """CREATE TRIGGER IF NOT EXISTS alumnos_fts_ad AFTER DELETE ON alumnos BEGIN
+                 INSERT INTO alumnos_fts(alumnos_fts, rowid, nombre, apellido, apoderado, telefono) VALUES ('delete', old.id, old.nombre, old.apellido, old.apoderado, old.telefono);
+             END""",
+        """CREATE TRIGGER IF NOT EXISTS alumnos_fts_au AFTER UPDATE OF nombre, apellido, apoderado, telefono ON alumnos BEGIN
+                 INSERT INTO alumnos_fts(alumnos_fts, rowid, nombre, apellido, apoderado, telefono) VALUES ('delete', old.id, old.nombre, old.apellido, old.apoderado, old.telefono);
+                 INSERT INTO alumnos_fts(rowid, nombre, apellido, apoderado, telefono) VALUES (new.id, new.nombre, new.apellido, new.apoderado, new.telefono);
+             END""",
+        "INSERT INTO alumnos_fts(alumnos_fts) VALUES ('rebuild')",
+    ]),
+    (4, [
+        # Resumen por matrícula (contador de 12 clases), mantenido por triggers.
+        # Las escrituras en asistencia deben usar UPSERT (ON CONFLICT DO UPDATE), no INSERT OR REPLACE:
+        # REPLACE borra sin disparar el trigger de DELETE.
+        """CREATE TABLE IF NOT EXISTS resumen_asistencia (
+                 alumno_id INTEGER, 
+                 horario_id INTEGER, 
+                 presentes INTEGER DEFAULT 0, 
+                 faltas INTEGER DEFAULT 0, 
+                 justificadas INTEGER DEFAULT 0, 
+                 recuperadas INTEGER DEFAULT 0, 
+                 PRIMARY KEY(alumno_id, horario_id)) WITHOUT ROWID""",
+        """CREATE TRIGGER IF NOT EXISTS resumen_asis_ai AFTER INSERT ON asistencia BEGIN
+                 INSERT INTO resumen_asistencia (alumno_id, horario_id, presentes, faltas, justificadas)
+                 VALUES (new.alumno_id, new.horario_id, new.estado = 'Presente', new.estado = 'Falta', new.estado = 'Justificado')
+                 ON CONFLICT(alumno_id, horario_id) DO UPDATE SET
+                     presentes = presentes + excluded.presentes,
+                     faltas = faltas + excluded.faltas,
+                     justificadas = justificadas + excluded.justificadas;
+             END""",
+        """CREATE TRIGGER IF NOT EXISTS resumen_asis_ad AFTER DELETE ON asistencia BEGIN
+                 UPDATE resumen_asistencia SET
+                     presentes = presentes - (old.estado = 'Presente'),
+                     faltas = faltas - (old.estado = 'Falta'),
+                     justificadas = justificadas - (old.estado = 'Justificado')
+                 WHERE alumno_id = old.alumno_id AND horario_id = old.horario_id;
+             END""",
+        """CREATE TRIGGER IF NOT EXISTS resumen_asis_au AFTER UPDATE OF estado, alumno_id, horario_id ON asistencia BEGIN
+                 UPDATE resumen_asistencia SET
+                     presentes = presentes - (old.estado = 'Presente'),
+                     faltas = faltas - (old.estado = 'Falta'),
+                     justificadas = justificadas - (old.estado = 'Justificado')
+                 WHERE alumno_id = old.alumno_id AND horario_id = old.horario_id;
+                 INSERT INTO resumen_asistencia (alumno_id, horario_id, presentes, faltas, justificadas)
+                 VALUES (new.alumno_id, new.horario_id, new.estado = 'Presente', new.estado = 'Falta', new.estado = 'Justificado')
+                 ON CONFLICT(alumno_id, horario_id) DO UPDATE SET
+                     presentes = presentes + excluded.presentes,
+                     faltas = faltas + excluded.faltas,
+                     justificadas = justificadas + excluded.justificadas;
+             END""",
+        # Recuperación asistida: suma a la matrícula donde estaba la falta justificada
+        """CREATE TRIGGER IF NOT EXISTS resumen_rec_ai AFTER INSERT ON recuperaciones WHEN new.asistio BEGIN
+                 UPDATE resumen_asistencia SET recuperadas = recuperadas + 1
+                 WHERE alumno_id = new.alumno_id AND horario_id = (SELECT horario_id FROM asistencia
+                       WHERE alumno_id = new.alumno_id AND fecha = new.fecha_origen AND estado = 'Justificado' LIMIT 1);
+             END""",
+        """CREATE TRIGGER IF NOT EXISTS resumen_rec_ad AFTER DELETE ON recuperaciones WHEN old.asistio BEGIN
+                 UPDATE resumen_asistencia SET recuperadas = recuperadas - 1
+                 WHERE alumno_id = old.alumno_id AND horario_id = (SELECT horario_id FROM asistencia
+                       WHERE alumno_id = old.alumno_id AND fecha = old.fecha_origen AND estado = 'Justificado' LIMIT 1);
+             END""",
+        """CREATE TRIGGER IF NOT EXISTS resumen_rec_au AFTER UPDATE OF asistio ON recuperaciones WHEN (old.asistio != 0) != (new.asistio != 0) BEGIN
+                 UPDATE resumen_asistencia SET recuperadas = recuperadas + CASE WHEN new.asistio THEN 1 ELSE -1 END
+                 WHERE alumno_id = new.alumno_id AND horario_id = (SELECT horario_id FROM asistencia
+                       WHERE alumno_id = new.alumno_id AND fecha = new.fecha_origen AND estado = 'Justificado' LIMIT 1);
+             END""",
+        """CREATE TRIGGER IF NOT EXISTS resumen_mat_ad AFTER DELETE ON matriculas BEGIN
+                 DELETE FROM resumen_asistencia WHERE alumno_id = old.alumno_id AND horario_id = old.horario_id;
+             END""",
+        # Carga inicial con lo que ya existe
+        """INSERT OR REPLACE INTO resumen_asistencia (alumno_id, horario_id, presentes, faltas, justificadas, recuperadas)
+           SELECT alumno_id, horario_id, SUM(estado = 'Presente'), SUM(estado = 'Falta'), SUM(estado = 'Justificado'), 0
+           FROM asistencia GROUP BY alumno_id, horario_id""",
+        RECALCULO_RECUPERADAS,
+    ]),
+    (5, [
+        # Calendario de clases persistido por (ciclo, grupo) y días sin clase
+        "CREATE TABLE IF NOT EXISTS feriados (fecha TEXT PRIMARY KEY, motivo TEXT)",
+        """CREATE TABLE IF NOT EXISTS clase_fechas (
+                 ciclo_id INTEGER, 
+                 grupo TEXT, 
+                 n INTEGER, 
+                 fecha TEXT, 
+                 PRIMARY KEY(ciclo_id, grupo, n)) WITHOUT ROWID""",
+        "CREATE INDEX IF NOT EXISTS idx_clase_fechas_fecha ON clase_fechas(fecha, ciclo_id, grupo)",
+        lambda c: regenerar_calendario(c),
+    ]),
+    (6, [
+        # Llaves foráneas con borrado en cascada. Primero se limpian filas huérfanas que dejaron
+        # los borrados anteriores; luego se reconstruyen las tablas hijas con las nuevas restricciones.
+        "DELETE FROM horarios WHERE ciclo_id NOT IN (SELECT id FROM ciclos)",
+        "DELETE FROM matriculas WHERE alumno_id NOT IN (SELECT id FROM alumnos) OR horario_id NOT IN (SELECT id FROM horarios)",
+        "DELETE FROM asistencia WHERE alumno_id NOT IN (SELECT id FROM alumnos) OR horario_id NOT IN (SELECT id FROM horarios)",
+        "DELETE FROM recuperaciones WHERE alumno_id NOT IN (SELECT id FROM alumnos) OR horario_destino_id NOT IN (SELECT id FROM horarios)",
+        "DELETE FROM incidentes WHERE alumno_id NOT IN (SELECT id FROM alumnos)",
+        "DELETE FROM clase_fechas WHERE ciclo_id NOT IN (SELECT id FROM ciclos)",
+        "DELETE FROM resumen_asistencia WHERE alumno_id NOT IN (SELECT id FROM alumnos) OR horario_id NOT IN (SELECT id FROM horarios)",
+        lambda c: reconstruir_tabla(c, "horarios", '''CREATE TABLE horarios (id INTEGER PRIMARY KEY AUTOINCREMENT, ciclo_id INTEGER REFERENCES ciclos(id) ON DELETE CASCADE, grupo TEXT, hora_inicio TEXT, nivel_salon TEXT, capacidad INTEGER)'''),
+        # Un salón con alumnos no se puede borrar (RESTRICT); el resto cae con el alumno o el salón
+        lambda c: reconstruir_tabla(c, "matriculas", '''CREATE TABLE matriculas (id INTEGER PRIMARY KEY AUTOINCREMENT, alumno_id INTEGER REFERENCES alumnos(id) ON DELETE CASCADE, horario_id INTEGER REFERENCES horarios(id) ON DELETE RESTRICT, fecha_registro DATE)'''),
+        lambda c: reconstruir_tabla(c, "asistencia", '''CREATE TABLE asistencia (id INTEGER PRIMARY KEY AUTOINCREMENT, alumno_id INTEGER REFERENCES alumnos(id) ON DELETE CASCADE, horario_id INTEGER REFERENCES horarios(id) ON DELETE CASCADE, fecha TEXT, estado TEXT, UNIQUE(alumno_id, horario_id, fecha))'''),
+        lambda c: reconstruir_tabla(c, "recuperaciones", '''CREATE TABLE recuperaciones (
+                 id INTEGER PRIMARY KEY AUTOINCREMENT, 
+                 alumno_id INTEGER REFERENCES alumnos(id) ON DELETE CASCADE, 
+                 fecha_origen TEXT, 
+                 horario_destino_id INTEGER REFERENCES horarios(id) ON DELETE CASCADE, 
+                 fecha_destino TEXT, 
+                 asistio BOOLEAN DEFAULT 0)'''),
+        lambda c: reconstruir_tabla(c, "incidentes", '''CREATE TABLE incidentes (
+                 id INTEGER PRIMARY KEY AUTOINCREMENT, 
+                 alumno_id INTEGER REFERENCES alumnos(id) ON DELETE CASCADE, 
+                 fecha DATE, 
+                 detalle TEXT, 
+                 gravedad TEXT)'''),
+        lambda c: reconstruir_tabla(c, "clase_fechas", '''CREATE TABLE clase_fechas (
+                 ciclo_id INTEGER REFERENCES ciclos(id) ON DELETE CASCADE, 
+                 grupo TEXT, 
+                 n INTEGER, 
+                 fecha TEXT, 
+                 PRIMARY KEY(ciclo_id, grupo, n)) WITHOUT ROWID'''),
+        lambda c: reconstruir_tabla(c, "resumen_asistencia", """CREATE TABLE resumen_asistencia (
+                 alumno_id INTEGER REFERENCES alumnos(id) ON DELETE CASCADE, 
+                 horario_id INTEGER REFERENCES horarios(id) ON DELETE CASCADE, 
+                 presentes INTEGER DEFAULT 0, 
+                 faltas INTEGER DEFAULT 0, 
+                 justificadas INTEGER DEFAULT 0, 
+                 recuperadas INTEGER DEFAULT 0, 
+                 PRIMARY KEY(alumno_id, horario_id)) WITHOUT ROWID"""),
+    ]),
+    (7, [
+        # Historial de incidentes paginado por (fecha, id), con o sin filtro de gravedad / alumno
+        "CREATE INDEX IF NOT EXISTS idx_incidentes_fecha ON incidentes(fecha)",
+        "CREATE INDEX IF NOT EXISTS idx_incidentes_gravedad ON incidentes(gravedad, fecha)",
+        "DROP INDEX IF EXISTS idx_incidentes_alumno",
+        "CREATE INDEX IF NOT EXISTS idx_incidentes_alumno ON incidentes(alumno_id, fecha)",
+    ]),
+    (8, [
+        # "recuperadas" también depende de la falta de origen: si una celda Justificado con
+        # recuperación asistida se borra o cambia de estado, el crédito se descuenta (y se suma
+        # si la celda vuelve a Justificado). Se recalcula lo que ya quedó desfasado.
+        "DROP TRIGGER IF EXISTS resumen_asis_ai",
+        "DROP TRIGGER IF EXISTS resumen_asis_ad",
+        "DROP TRIGGER IF EXISTS resumen_asis_au",
+        f"""CREATE TRIGGER resumen_asis_ai AFTER INSERT ON asistencia BEGIN
+                 INSERT INTO resumen_asistencia (alumno_id, horario_id, presentes, faltas, justificadas, recuperadas)
+                 VALUES (new.alumno_id, new.horario_id, new.estado = 'Presente', new.estado = 'Falta', new.estado = 'Justificado', {RECUPERADAS.format("new")})
+                 ON CONFLICT(alumno_id, horario_id) DO UPDATE SET
+                     presentes = presentes + excluded.presentes,
+                     faltas = faltas + excluded.faltas,
+                     justificadas = justificadas + excluded.justificadas,
+                     recuperadas = recuperadas + excluded.recuperadas;
+             END""",
+        f"""CREATE TRIGGER resumen_asis_ad AFTER DELETE ON asistencia BEGIN
+                 UPDATE resumen_asistencia SET
+                     presentes = presentes - (old.estado = 'Presente'),
+                     faltas = faltas - (old.estado = 'Falta'),
+                     justificadas = justificadas - (old.estado = 'Justificado'),
+                     recuperadas = recuperadas - {RECUPERADAS.format("old")}
+                 WHERE alumno_id = old.alumno_id AND horario_id = old.horario_id;
+             END""",
+        f"""CREATE TRIGGER resumen_asis_au AFTER UPDATE OF estado, alumno_id, horario_id, fecha ON asistencia BEGIN
+                 UPDATE resumen_asistencia SET
+                     presentes = presentes - (old.estado = 'Presente'),
+                     faltas = faltas - (old.estado = 'Falta'),
+                     justificadas = justificadas - (old.estado = 'Justificado'),
+                     recuperadas = recuperadas - {RECUPERADAS.format("old")}
+                 WHERE alumno_id = old.alumno_id AND horario_id = old.horario_id;
+                 INSERT INTO resumen_asistencia (alumno_id, horario_id, presentes, faltas, justificadas, recuperadas)
+                 VALUES (new.alumno_id, new.horario_id, new.estado = 'Presente', new.estado = 'Falta', new.estado = 'Justificado', {RECUPERADAS.format("new")})
+                 ON CONFLICT(alumno_id, horario_id) DO UPDATE SET
+                     presentes = presentes + excluded.presentes,
+                     faltas = faltas + excluded.faltas,
+                     justificadas = justificadas + excluded.justificadas,
+                     recuperadas = recuperadas + excluded.recuperadas;
+             END""",
+        # Los triggers de recuperaciones (v4) acreditaban solo una matrícula (LIMIT 1); ahora todas
+        # las que cuenta RECUPERADAS, y también si la recuperación cambia de alumno o de falta
+        "DROP TRIGGER IF EXISTS resumen_rec_ai",
+        "DROP TRIGGER IF EXISTS resumen_rec_ad",
+        "DROP TRIGGER IF EXISTS resumen_rec_au",
+        f"""CREATE TRIGGER resumen_rec_ai AFTER INSERT ON recuperaciones WHEN new.asistio BEGIN
+                 UPDATE resumen_asistencia SET recuperadas = recuperadas + 1 WHERE {ORIGEN_RECUPERACION.format("new")};
+             END""",
+        f"""CREATE TRIGGER resumen_rec_ad AFTER DELETE ON recuperaciones WHEN old.asistio BEGIN
+                 UPDATE resumen_asistencia SET recuperadas = recuperadas - 1 WHERE {ORIGEN_RECUPERACION.format("old")};
+             END""",
+        f"""CREATE TRIGGER resumen_rec_au AFTER UPDATE OF asistio, alumno_id, fecha_origen ON recuperaciones BEGIN
+                 UPDATE resumen_asistencia SET recuperadas = recuperadas - 1 WHERE old.asistio AND {ORIGEN_RECUPERACION.format("old")};
+                 UPDATE resumen_asistencia SET recuperadas = recuperadas + 1 WHERE new.asistio AND {ORIGEN_RECUPERACION.format("new")};
+             END""",
+        RECALCULO_RECUPERADAS,
+    ]),
+    (9, [
+        # Borrar o archivar un ciclo no debe llevarse las recuperaciones que alumnos de otros ciclos
+        # hicieron en sus salones: el destino queda en NULL y la falta sigue recuperada
+        lambda c: reconstruir_tabla(c, "recuperaciones", '''CREATE TABLE recuperaciones (
+                 id INTEGER PRIMARY KEY AUTOINCREMENT, 
+                 alumno_id INTEGER REFERENCES alumnos(id) ON DELETE CASCADE, 
+                 fecha_origen TEXT, 
+                 horario_destino_id INTEGER REFERENCES horarios(id) ON DELETE SET NULL, 
+                 fecha_destino TEXT, 
+                 asistio BOOLEAN DEFAULT 0)'''),
+    ]),
+]
+
+# Cambia la definición de una tabla (p. ej. sus llaves foráneas) copiando los datos a una tabla nueva.
+# Conserva índices y triggers. Requiere foreign_keys=OFF (lo hace init_db).
+def reconstruir_tabla(c, tabla, ddl):
+    extras = [r[0] for r in c.execute("SELECT sql FROM sqlite_schema WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL", (tabla,))]
+    cols = ", ".join(r[1] for r in c.execute(f"PRAGMA table_info({tabla})"))
+    c.execute("PRAGMA legacy_alter_table = ON")   # que RENAME no reescriba triggers de otras tablas
+    c.execute(ddl.replace(f"CREATE TABLE {tabla} ", f"CREATE TABLE {tabla}_nueva ", 1))
+    c.execute(f"INSERT INTO {tabla}_nueva ({cols}) SELECT {cols} FROM {tabla}")
+    c.execute(f"DROP TABLE {tabla}")
+    c.execute(f"ALTER TABLE {tabla}_nueva RENAME TO {tabla}")
+    c.execute("PRAGMA legacy_alter_table = OFF")
+    for sql in extras: c.execute(sql)
+
+@lru_cache(maxsize=None)
+def init_db():
+    # Aplica solo las migraciones pendientes, una vez por proceso.
+    # foreign_keys se apaga mientras tanto (no puede cambiarse dentro de una transacción)
+    # para poder reconstruir tablas; al final se verifica la integridad.
+    with get_pool().conexion() as conn:
+        conn.execute("PRAGMA foreign_keys = OFF")
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            c = conn.cursor()
+            try:
+                c.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER PRIMARY KEY, aplicada TEXT)")
+                actual = c.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+                for version, sentencias in MIGRACIONES:
+                    if version <= actual: continue
+                    for sql in sentencias:
+                        if callable(sql): sql(c)   # pasos en Python (cargas iniciales, reconstrucciones)
+                        else: c.execute(sql)
+                    c.execute("INSERT INTO schema_version (version, aplicada) VALUES (?, ?)", (version, datetime.now().isoformat(timespec="seconds")))
+                malas = c.execute("PRAGMA foreign_key_check").fetchall()
+                if malas: raise sqlite3.IntegrityError(f"Llaves foráneas inválidas tras migrar: {malas[:5]}")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.execute("PRAGMA foreign_keys = ON")
+    return True
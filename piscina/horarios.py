@@ -0,0 +1,62 @@
+# Salones (horarios) de cada ciclo: ocupación, alta y baja
+from __future__ import annotations
+
+import json
+from typing import Iterable, NamedTuple
+
+from .bd import escritura, run_query
+
+class Salon(NamedTuple):
+    id: int
+    grupo: str
+    hora_inicio: str
+    nivel_salon: str
+    capacidad: int
+    ocupados: int
+
+class SalonDestino(NamedTuple):
+    id: int
+    etiqueta: str
+
+# Ocupación de salones: capacidad, matriculados y libres en una sola consulta agrupada
+def ocupacion_salones(ciclo_id: int, grupo: str | None = None, hora: str | None = None) -> list[Salon]:
+    filtro, params = "h.ciclo_id = ?", [ciclo_id]
+    if grupo: filtro += " AND h.grupo = ?"; params.append(grupo)
+    if hora: filtro += " AND h.hora_inicio = ?"; params.append(hora)
+    res = run_query(f"""
+        SELECT h.id, h.grupo, h.hora_inicio, h.nivel_salon, h.capacidad, COUNT(m.id) AS ocupados
+        FROM horarios h LEFT JOIN matriculas m ON m.horario_id = h.id
+        WHERE {filtro}
+        GROUP BY h.id
+        ORDER BY h.hora_inicio, h.grupo, h.nivel_salon
+    """, params, return_data=True, cache=True, fila=Salon)
+    return res or []
+
+# Crea el salón si no existe otro igual en el ciclo (verificado en la misma sentencia)
+@escritura("horarios")
+def crear_salon(c, ciclo_id: int, grupo: str, hora: str, nivel: str, capacidad: int) -> bool:
+    c.execute("""INSERT INTO horarios (ciclo_id, grupo, hora_inicio, nivel_salon, capacidad)
+                 SELECT ?, ?, ?, ?, ? WHERE NOT EXISTS (
+                     SELECT 1 FROM horarios WHERE ciclo_id=? AND grupo=? AND hora_inicio=? AND nivel_salon=?)""",
+              (ciclo_id, grupo, hora, nivel, capacidad, ciclo_id, grupo, hora, nivel))
+    return c.rowcount == 1
+
+# Borra salones sin matrículas (los que tienen alumnos se omiten). Devuelve cuántos se borraron.
+@escritura("horarios", "asistencia", "recuperaciones")
+def eliminar_salones(c, ids: Iterable[int]) -> int:
+    c.execute("""DELETE FROM horarios WHERE id IN (SELECT value FROM json_each(?))
+                 AND NOT EXISTS (SELECT 1 FROM matriculas m WHERE m.horario_id = horarios.id)""", (json.dumps(list(ids)),))
+    return c.rowcount
+
+# Salones que tienen clase en una fecha (búsqueda por índice en clase_fechas), opcionalmente de un nivel
+def salones_en_fecha(fecha, nivel: str | None = None) -> list[SalonDestino]:
+    filtro, params = "cf.fecha = ?", [str(fecha)]
+    if nivel: filtro += " AND h.nivel_salon = ?"; params.append(nivel)
+    res = run_query(f"""
+        SELECT h.id, c.nombre || ' | ' || h.grupo || ' ' || h.hora_inicio || ' (' || h.nivel_salon || ')'
+        FROM clase_fechas cf JOIN horarios h ON h.ciclo_id = cf.ciclo_id AND h.grupo = cf.grupo
+        JOIN ciclos c ON c.id = h.ciclo_id
+        WHERE {filtro}
+        ORDER BY c.id DESC, h.hora_inicio, h.nivel_salon
+    """, params, return_data=True, cache=True, fila=SalonDestino)
+    return res or []
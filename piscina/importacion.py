@@ -0,0 +1,124 @@
+# Importación masiva de alumnos y matrículas desde CSV / Excel (usa pandas)
+from __future__ import annotations
+
+import csv
+import json
+import re
+import unicodedata
+from datetime import date, datetime, time
+from typing import Iterable, Iterator
+
+import pandas as pd
+
+from .bd import escribir, run_query
+from .config import DIAS, HORAS, NIVELES
+from .horarios import ocupacion_salones
+
+COLUMNAS_IMPORT = ["nombre", "apellido", "telefono", "direccion", "apoderado", "condicion", "dias", "hora", "nivel"]
+IMPORT_CHUNK = 2000   # filas leídas por bloque
+INSERT_LOTE = 500     # filas por INSERT multi-VALUES
+
+def normalizar_texto(x) -> str:
+    # Minúsculas, sin tildes ni espacios extremos (para comparar nombres y columnas)
+    if x is None or (isinstance(x, float) and pd.isna(x)): return ""
+    return unicodedata.normalize("NFKD", str(x)).encode("ascii", "ignore").decode().strip().lower()
+
+def clave_alumno(nombre, apellido, telefono):
+    return (normalizar_texto(nombre), normalizar_texto(apellido), re.sub(r"\D", "", str(telefono or "")))
+
+def texto_celda(v) -> str | None:
+    # Celdas de Excel a texto como se escribirían en un CSV: horas HH:MM, fechas YYYY-MM-DD
+    if v is None: return None
+    if isinstance(v, datetime): return v.strftime("%Y-%m-%d")
+    if isinstance(v, time): return v.strftime("%H:%M")
+    if isinstance(v, date): return v.isoformat()
+    return str(v)
+
+def leer_archivo_alumnos(archivo, nombre_archivo: str, chunksize: int = IMPORT_CHUNK) -> Iterator[pd.DataFrame]:
+    # Generador de bloques de filas; CSV (separador , o ; detectado) y Excel se leen por partes
+    if nombre_archivo.lower().endswith(".xlsx"):
+        try: from openpyxl import load_workbook
+        except ImportError: raise ValueError("Para leer Excel instala openpyxl (pip install openpyxl).") from None
+        try: wb = load_workbook(archivo, read_only=True, data_only=True)   # read_only: fila por fila, sin cargar la hoja
+        except Exception as e: raise ValueError(f"No se pudo leer el Excel: {e}") from e
+        try:
+            filas = wb.active.iter_rows(values_only=True)
+            cols = [str(v or "") for v in next(filas, ())]
+            bloque, leidos = [], 0
+            for fila in filas:
+                fila = [texto_celda(v) for v in fila[:len(cols)]]
+                bloque.append(fila + [None] * (len(cols) - len(fila)))
+                if len(bloque) == chunksize: yield pd.DataFrame(bloque, columns=cols); leidos += 1; bloque = []
+            if bloque or not leidos: yield pd.DataFrame(bloque, columns=cols)
+        finally: wb.close()
+    else:
+        # Archivo vacío o de una sola columna: el detector de separador lanza csv.Error, que no es ValueError
+        try: yield from pd.read_csv(archivo, dtype=str, chunksize=chunksize, sep=None, engine="python", encoding="utf-8-sig")
+        except (csv.Error, pd.errors.ParserError, pd.errors.EmptyDataError) as e: raise ValueError(f"No se pudo leer el CSV: {e}") from e
+
+def importar_alumnos(bloques: Iterable[pd.DataFrame], ciclo_id: int, confirmar: bool = False) -> tuple[dict, list[tuple]]:
+    # Valida todas las filas y, si confirmar=True, inserta alumnos nuevos y matrículas en una sola transacción.
+    # Devuelve (resumen, errores) con errores = [(fila, alumno, motivo)].
+    dias = {normalizar_texto(d): d for d in DIAS} | {"lmv": DIAS[0], "mjs": DIAS[1]}
+    horas = {}
+    for h in HORAS: horas.update({normalizar_texto(h): h, h[:5]: h, h[:5].lstrip("0"): h})
+    niveles = {normalizar_texto(n): n for n in NIVELES}
+    salones = {(gr, ho, niv): [hid, cap - oc] for hid, gr, ho, niv, cap, oc in ocupacion_salones(ciclo_id)}
+    existentes = {clave_alumno(n, a, t): aid for aid, n, a, t in run_query("SELECT id, nombre, apellido, telefono FROM alumnos", return_data=True) or []}
+    ya_matric = set(run_query("SELECT m.alumno_id, m.horario_id FROM matriculas m JOIN horarios h ON h.id = m.horario_id WHERE h.ciclo_id = ?", (ciclo_id,), return_data=True) or [])
+
+    nuevos, matric, errores, vistos, n_filas = {}, [], [], set(), 0
+    for bloque in bloques:
+        bloque.columns = [normalizar_texto(col) for col in bloque.columns]
+        faltan = [col for col in ("nombre", "apellido", "dias", "hora", "nivel") if col not in bloque.columns]
+        if faltan: raise ValueError(f"Faltan columnas: {', '.join(faltan)}")
+        bloque = bloque.reindex(columns=COLUMNAS_IMPORT).fillna("")
+        for fila in bloque.itertuples(index=False):
+            n_filas += 1
+            nro, alumno = n_filas + 1, f"{fila.nombre} {fila.apellido}".strip()   # +1: encabezado
+            gr, ho = dias.get(normalizar_texto(fila.dias)), horas.get(normalizar_texto(fila.hora))
+            niv = niveles.get(normalizar_texto(fila.nivel))
+            if not fila.nombre.strip() or not fila.apellido.strip(): errores.append((nro, alumno, "Falta nombre o apellido")); continue
+            if not gr: errores.append((nro, alumno, f"Días inválidos: {fila.dias}")); continue
+            if not ho: errores.append((nro, alumno, f"Hora inválida: {fila.hora}")); continue
+            if not niv: errores.append((nro, alumno, f"Nivel inválido: {fila.nivel}")); continue
+            salon = salones.get((gr, ho, niv))
+            if not salon: errores.append((nro, alumno, f"No existe el salón {gr} {ho} {niv} en el ciclo")); continue
+            clave = clave_alumno(fila.nombre, fila.apellido, fila.telefono)
+            aid = existentes.get(clave)
+            if (clave, salon[0]) in vistos or (aid, salon[0]) in ya_matric: errores.append((nro, alumno, "Ya matriculado en ese salón")); continue
+            if salon[1] <= 0: errores.append((nro, alumno, "Salón lleno")); continue
+            salon[1] -= 1
+            vistos.add((clave, salon[0]))
+            if aid is None and clave not in nuevos:
+                nuevos[clave] = (fila.nombre.strip(), fila.apellido.strip(), fila.telefono.strip(), fila.direccion.strip(), niv, fila.apoderado.strip(), fila.condicion.strip())
+            matric.append((clave, salon[0], nro, alumno))
+
+    resumen = {"filas": n_filas, "alumnos_nuevos": len(nuevos), "matriculas": len(matric), "errores": len(errores)}
+    if confirmar and matric:
+        ids, hoy = dict(existentes), str(date.today())
+        def insertar(c):
+            # Cupos verificados de nuevo dentro de la transacción: la validación usó la ocupación en
+            # caché y otras matrículas (otra importación, la recepción) pueden haber entrado desde entonces
+            libres = dict(c.execute("""SELECT h.id, h.capacidad - COUNT(m.id) FROM horarios h LEFT JOIN matriculas m ON m.horario_id = h.id
+                                       WHERE h.id IN (SELECT value FROM json_each(?)) GROUP BY h.id""",
+                                    (json.dumps(list({hid for _, hid, _, _ in matric})),)))
+            caben, llenos = [], []
+            for m in matric:
+                if libres.get(m[1], 0) > 0: libres[m[1]] -= 1; caben.append(m)
+                else: llenos.append((m[2], m[3], "Salón lleno"))
+            claves = {clave for clave, *_ in caben}
+            lista = [fila for clave, fila in nuevos.items() if clave in claves]
+            for i in range(0, len(lista), INSERT_LOTE):
+                lote = lista[i:i + INSERT_LOTE]
+                sql = ("INSERT INTO alumnos (nombre, apellido, telefono, direccion, nivel, apoderado, condicion) VALUES "
+                       + ",".join(["(?,?,?,?,?,?,?)"] * len(lote)) + " RETURNING id, nombre, apellido, telefono")
+                for aid, n, a, t in c.execute(sql, [v for fila in lote for v in fila]).fetchall():
+                    ids[clave_alumno(n, a, t)] = aid
+            c.executemany("INSERT INTO matriculas (alumno_id, horario_id, fecha_registro) VALUES (?, ?, ?)",
+                          [(ids[clave], hid, hoy) for clave, hid, _, _ in caben])
+            return len(lista), len(caben), llenos
+        n_nuevos, n_matric, llenos = escribir(insertar, "alumnos", "matriculas").result()
+        errores = sorted(errores + llenos, key=lambda e: e[0])
+        resumen.update(alumnos_nuevos=n_nuevos, matriculas=n_matric, errores=len(errores))
+    return resumen, errores
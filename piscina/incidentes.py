@@ -0,0 +1,41 @@
+# Registro e historial de incidentes
+from __future__ import annotations
+
+from typing import NamedTuple
+
+from .bd import run_query
+
+GRAVEDADES = ["Leve", "Moderada", "Grave (Hospital)", "Crítica"]
+
+class Incidente(NamedTuple):
+    id: int
+    fecha: str
+    nombre: str
+    apellido: str
+    gravedad: str
+    detalle: str
+
+def registrar_incidente(alumno_id: int, fecha, detalle: str, gravedad: str) -> bool:
+    return run_query("INSERT INTO incidentes (alumno_id, fecha, detalle, gravedad) VALUES (?,?,?,?)", (alumno_id, str(fecha), detalle, gravedad))
+
+# Historial paginado por llave (fecha, id), del más reciente al más antiguo: "despues" es la llave del
+# último incidente de la página anterior, así cada página lee solo sus filas (sin OFFSET).
+# Se piden limite + 1 filas para saber si hay página siguiente sin contar el total.
+PAGINA_INCIDENTES = 20
+
+def historial_incidentes(limite: int = PAGINA_INCIDENTES, despues: tuple[str, int] | None = None, gravedad: str | None = None,
+                         desde=None, hasta=None, alumno_id: int | None = None) -> list[Incidente]:
+    filtro, params = [], []
+    if gravedad: filtro.append("i.gravedad = ?"); params.append(gravedad)
+    if desde: filtro.append("i.fecha >= ?"); params.append(str(desde))
+    if hasta: filtro.append("i.fecha <= ?"); params.append(str(hasta))
+    if alumno_id is not None: filtro.append("i.alumno_id = ?"); params.append(alumno_id)
+    if despues: filtro.append("(i.fecha, i.id) < (?, ?)"); params.extend(despues)
+    res = run_query(f"""
+        SELECT i.id, i.fecha, a.nombre, a.apellido, i.gravedad, i.detalle
+        FROM incidentes i JOIN alumnos a ON i.alumno_id = a.id
+        {"WHERE " + " AND ".join(filtro) if filtro else ""}
+        ORDER BY i.fecha DESC, i.id DESC
+        LIMIT ?
+    """, params + [limite], return_data=True, cache=True, fila=Incidente)
+    return res or []
@@ -0,0 +1,57 @@
+# Matrículas y su contador de clases
+from __future__ import annotations
+
+from datetime import date
+from typing import Iterable, NamedTuple
+
+from .bd import escritura, run_many, run_query
+from .config import CLASES_META
+
+class ResumenMatricula(NamedTuple):
+    alumno_id: int
+    alumno: str
+    horario_id: int
+    ciclo: str
+    salon: str
+    presentes: int
+    faltas: int
+    justificadas: int
+    recuperadas: int
+    restantes: int
+
+# Alumno nuevo y su matrícula en la misma transacción (lastrowid de la misma conexión). Devuelve el id.
+@escritura("alumnos", "matriculas")
+def matricular_alumno_nuevo(c, horario_id: int, nombre: str, apellido: str, telefono: str = "", direccion: str = "",
+                            apoderado: str = "", condicion: str = "", nivel: str = "Registrado") -> int:
+    c.execute("INSERT INTO alumnos (nombre, apellido, telefono, direccion, nivel, apoderado, condicion) VALUES (?, ?, ?, ?, ?, ?, ?)",
+              (nombre, apellido, telefono, direccion, nivel, apoderado, condicion))
+    aid = c.lastrowid
+    c.execute("INSERT INTO matriculas (alumno_id, horario_id, fecha_registro) VALUES (?, ?, ?)", (aid, horario_id, str(date.today())))
+    return aid
+
+# Matrícula de alumnos existentes: [(alumno_id, horario_id)]
+def matricular(pares: Iterable[tuple[int, int]]) -> bool:
+    hoy = str(date.today())
+    return run_many("INSERT INTO matriculas (alumno_id, horario_id, fecha_registro) VALUES (?, ?, ?)",
+                    [(aid, hid, hoy) for aid, hid in pares])
+
+# Contador por matrícula desde resumen_asistencia (sin recorrer el historial)
+def resumen_matriculas(ciclo_id: int | None = None, alumno_ids: list[int] | None = None) -> list[ResumenMatricula]:
+    filtro, params = [], []
+    if ciclo_id is not None: filtro.append("h.ciclo_id = ?"); params.append(ciclo_id)
+    if alumno_ids is not None:
+        filtro.append(f"m.alumno_id IN ({','.join('?' * len(alumno_ids))})"); params.extend(alumno_ids)
+    res = run_query(f"""
+        SELECT m.alumno_id, a.nombre || ' ' || a.apellido, m.horario_id, c.nombre,
+               h.grupo || ' ' || h.hora_inicio || ' (' || h.nivel_salon || ')',
+               COALESCE(r.presentes, 0), COALESCE(r.faltas, 0), COALESCE(r.justificadas, 0), COALESCE(r.recuperadas, 0),
+               MAX(0, ? - COALESCE(r.presentes + r.faltas + r.justificadas, 0))
+        FROM matriculas m
+        JOIN alumnos a ON a.id = m.alumno_id
+        JOIN horarios h ON h.id = m.horario_id
+        JOIN ciclos c ON c.id = h.ciclo_id
+        LEFT JOIN resumen_asistencia r ON r.alumno_id = m.alumno_id AND r.horario_id = m.horario_id
+        {"WHERE " + " AND ".join(filtro) if filtro else ""}
+        ORDER BY c.id DESC, h.hora_inicio, a.apellido, a.nombre
+    """, [CLASES_META] + params, return_data=True, cache=True, fila=ResumenMatricula)
+    return res or []
@@ -0,0 +1,174 @@
+# Faltas justificadas pendientes, agenda de recuperaciones y visitantes
+from __future__ import annotations
+
+import json
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+from typing import Iterable, NamedTuple
+
+from .bd import ConflictoEdicion, escritura, run_query
+from .config import HORAS
+
+class Pendiente(NamedTuple):
+    alumno_id: int
+    nombre: str
+    apellido: str
+    fecha: str
+    grupo: str
+    nivel_salon: str
+    horario_id: int
+    total: int
+
+class Propuesta(NamedTuple):
+    alumno_id: int
+    nombre: str
+    apellido: str
+    fecha_origen: str
+    horario_id: int
+    fecha_destino: str
+    salon: str
+
+class Visitante(NamedTuple):
+    id: int
+    fecha_destino: str
+    nombre: str
+    apellido: str
+    asistio: int
+
+class Recuperacion(NamedTuple):
+    fecha_destino: str
+    nombre: str
+    apellido: str
+    hora_inicio: str
+    nivel_salon: str
+    asistio: int
+
+# Faltas justificadas sin recuperación agendada, paginadas; la última columna es el total
+PAGINA_PENDIENTES = 20
+
+def pendientes_recuperacion(limite: int, offset: int = 0) -> list[Pendiente]:
+    res = run_query("""
+        SELECT asis.alumno_id, a.nombre, a.apellido, asis.fecha, h.grupo, h.nivel_salon, asis.horario_id,
+               COUNT(*) OVER () AS total
+        FROM asistencia asis
+        JOIN alumnos a ON asis.alumno_id = a.id
+        JOIN horarios h ON asis.horario_id = h.id
+        WHERE asis.estado = 'Justificado'
+        AND NOT EXISTS (SELECT 1 FROM recuperaciones r WHERE r.alumno_id = asis.alumno_id AND r.fecha_origen = asis.fecha)
+        ORDER BY asis.fecha, asis.alumno_id
+        LIMIT ? OFFSET ?
+    """, (limite, offset), return_data=True, cache=True, fila=Pendiente)
+    return res or []
+
+# Agenda automática de recuperaciones: a cada falta pendiente le asigna el primer
+# (salón, fecha) de su nivel con cupo libre, dentro de las horas y el horizonte pedidos.
+# Cupo libre = capacidad - matriculados - recuperaciones ya agendadas ese día.
+def planificar_recuperaciones(horas: list[str] | None = None, horizonte: int = 30, hoy: date | None = None) -> tuple[list[Propuesta], list[tuple]]:
+    hoy = hoy or date.today()
+    desde, hasta = hoy.strftime("%Y-%m-%d"), (hoy + timedelta(days=horizonte)).strftime("%Y-%m-%d")
+    horas = set(horas or HORAS)
+    turnos_bd = run_query("""
+        SELECT h.id, h.grupo, h.hora_inicio, h.nivel_salon, cf.fecha,
+               COALESCE(h.capacidad, 0) - (SELECT COUNT(*) FROM matriculas m WHERE m.horario_id = h.id)
+        FROM clase_fechas cf JOIN horarios h ON h.ciclo_id = cf.ciclo_id AND h.grupo = cf.grupo
+        WHERE cf.fecha BETWEEN ? AND ?
+    """, (desde, hasta), return_data=True, cache=True) or []
+    agendadas = {(hd, f): n for hd, f, n in run_query("""
+        SELECT horario_destino_id, fecha_destino, COUNT(*) FROM recuperaciones
+        WHERE fecha_destino BETWEEN ? AND ? GROUP BY 1, 2
+    """, (desde, hasta), return_data=True) or []}
+
+    # Por nivel: turnos (fecha, salón) ordenados y cupos libres de cada uno
+    turnos, info = {}, {}
+    for hid, gr, ho, niv, f, libres in turnos_bd:
+        info[hid] = (gr, ho, niv)
+        if ho in horas: turnos.setdefault(niv, []).append([f, hid, libres - agendadas.get((hid, f), 0)])
+    for lst in turnos.values(): lst.sort()
+    fechas = {niv: [t[0] for t in lst] for niv, lst in turnos.items()}
+
+    # "Siguiente turno con cupo" por nivel (union-find): los turnos llenos se saltan en O(1) amortizado
+    sig = {niv: [i + 1 if i < len(lst) and lst[i][2] <= 0 else i for i in range(len(lst) + 1)] for niv, lst in turnos.items()}
+    def buscar(niv, i):
+        p, r = sig[niv], i
+        while p[r] != r: r = p[r]
+        while p[i] != r: p[i], i = r, p[i]
+        return r
+
+    plan, sin_cupo, usados = [], [], set()
+    for aid, nom, ape, f_falta, grup, niv, hid_o, _ in pendientes_recuperacion(-1):
+        lst = turnos.get(niv)
+        if not lst: sin_cupo.append((aid, nom, ape, f_falta)); continue
+        # Primer turno desde hoy y posterior a la falta
+        fs = fechas[niv]
+        i = buscar(niv, bisect_left(fs, desde) if f_falta < desde else bisect_right(fs, f_falta))
+        while i < len(lst) and (lst[i][1] == hid_o or (aid, lst[i][1], lst[i][0]) in usados):
+            i = buscar(niv, i + 1)
+        if i >= len(lst): sin_cupo.append((aid, nom, ape, f_falta)); continue
+        f, hd, _ = lst[i]
+        lst[i][2] -= 1
+        if lst[i][2] <= 0: sig[niv][i] = i + 1
+        usados.add((aid, hd, f))
+        gr, ho, _ = info[hd]
+        plan.append(Propuesta(aid, nom, ape, f_falta, hd, f, f"{gr} {ho} ({niv})"))
+    return plan, sin_cupo
+
+# Agenda recuperaciones: [(alumno_id, fecha_origen, horario_destino_id, fecha_destino)].
+# Cupos y faltas se verifican de nuevo dentro de la transacción (otra sesión pudo agendar desde la
+# vista previa): las filas que ya no caben no se guardan. Devuelve (agendadas, [(fila, motivo)]).
+@escritura("recuperaciones")
+def agendar_recuperaciones(c, filas: Iterable[tuple]) -> tuple[int, list[tuple]]:
+    filas = [tuple(f) for f in filas]
+    faltas = {(a, f): (justificada, agendada) for a, f, justificada, agendada in c.execute("""
+        SELECT a, f, EXISTS (SELECT 1 FROM asistencia s WHERE s.alumno_id = a AND s.fecha = f AND s.estado = 'Justificado'),
+               EXISTS (SELECT 1 FROM recuperaciones r WHERE r.alumno_id = a AND r.fecha_origen = f)
+        FROM (SELECT DISTINCT json_extract(value, '$[0]') AS a, json_extract(value, '$[1]') AS f FROM json_each(?))
+    """, (json.dumps([f[:2] for f in filas]),))}
+    libres = {(hd, fd): n for hd, fd, n in c.execute("""
+        SELECT h.id, t.fd, COALESCE(h.capacidad, 0) - (SELECT COUNT(*) FROM matriculas m WHERE m.horario_id = h.id)
+               - (SELECT COUNT(*) FROM recuperaciones r WHERE r.horario_destino_id = h.id AND r.fecha_destino = t.fd)
+        FROM (SELECT DISTINCT json_extract(value, '$[0]') AS hd, json_extract(value, '$[1]') AS fd FROM json_each(?)) t
+        JOIN horarios h ON h.id = t.hd
+    """, (json.dumps([f[2:] for f in filas]),))}
+    ok, rechazadas = [], []
+    for fila in filas:
+        justificada, agendada = faltas.get(fila[:2], (0, 0))
+        if not justificada: rechazadas.append((fila, "La falta ya no está justificada")); continue
+        if agendada: rechazadas.append((fila, "Ya tiene recuperación agendada")); continue
+        if libres.get(fila[2:], 0) <= 0: rechazadas.append((fila, "Salón lleno ese día")); continue
+        libres[fila[2:]] -= 1
+        faltas[fila[:2]] = (1, 1)
+        ok.append(fila)
+    c.executemany("INSERT INTO recuperaciones (alumno_id, fecha_origen, horario_destino_id, fecha_destino) VALUES (?,?,?,?)", ok)
+    return len(ok), rechazadas
+
+# Recuperaciones asignadas a un salón (alumnos visitantes)
+def visitantes_salon(hid: int) -> list[Visitante]:
+    res = run_query("""
+        SELECT r.id, r.fecha_destino, a.nombre, a.apellido, r.asistio
+        FROM recuperaciones r
+        JOIN alumnos a ON r.alumno_id = a.id
+        WHERE r.horario_destino_id = ?
+        ORDER BY r.fecha_destino
+    """, (hid,), return_data=True, cache=True, fila=Visitante)
+    return res or []
+
+# cambios: [(asistio, recuperacion_id, asistio_antes)]; con control optimista como guardar_asistencia
+@escritura("recuperaciones")
+def marcar_visitantes(c, cambios: Iterable[tuple[int, int, int]]) -> int:
+    cambios = list(cambios)
+    actual = dict(c.execute("SELECT id, asistio FROM recuperaciones WHERE id IN (SELECT value FROM json_each(?))",
+                            (json.dumps([rid for _, rid, _ in cambios]),)))
+    conflictos = [(rid, actual.get(rid)) for asistio, rid, antes in cambios if rid not in actual or bool(actual[rid]) not in (bool(antes), bool(asistio))]
+    if conflictos: raise ConflictoEdicion(conflictos)
+    c.executemany("UPDATE recuperaciones SET asistio=? WHERE id=?", [(asistio, rid) for asistio, rid, _ in cambios])
+    return len(cambios)
+
+def calendario_recuperaciones() -> list[Recuperacion]:
+    res = run_query("""
+        SELECT r.fecha_destino, a.nombre, a.apellido, h.hora_inicio, COALESCE(h.nivel_salon, '(ciclo archivado)'), r.asistio
+        FROM recuperaciones r
+        JOIN alumnos a ON r.alumno_id = a.id
+        LEFT JOIN horarios h ON r.horario_destino_id = h.id   -- NULL: el salón destino era de un ciclo ya borrado
+        ORDER BY r.fecha_destino
+    """, return_data=True, cache=True, fila=Recuperacion)
+    return res or []
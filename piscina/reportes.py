@@ -0,0 +1,127 @@
+# Reportes agregados y su exportación por lotes a CSV, Parquet o Excel (usa pandas)
+from __future__ import annotations
+
+import tempfile
+from typing import Iterator
+
+import pandas as pd
+
+from .bd import get_pool
+from .config import CLASES_META
+
+# Cada reporte es una consulta agregada en SQL; las filas se leen por lotes del cursor
+# y se escriben al archivo a medida que llegan, así la memoria no crece con el historial.
+REPORTE_LOTE = 5000
+
+def reporte_asistencia(ciclo_id):
+    clases = ",\n".join(f"MAX(CASE WHEN cf.n = {k} THEN s.estado END) AS clase_{k}" for k in range(1, CLASES_META + 1))
+    return f"""
+        SELECT c.nombre AS ciclo, h.grupo, h.hora_inicio, h.nivel_salon AS salon, a.apellido, a.nombre,
+               {clases},
+               COALESCE(r.presentes, 0) AS presentes, COALESCE(r.faltas, 0) AS faltas,
+               COALESCE(r.justificadas, 0) AS justificadas, COALESCE(r.recuperadas, 0) AS recuperadas
+        FROM matriculas m
+        JOIN alumnos a ON a.id = m.alumno_id
+        JOIN horarios h ON h.id = m.horario_id
+        JOIN ciclos c ON c.id = h.ciclo_id
+        JOIN clase_fechas cf ON cf.ciclo_id = h.ciclo_id AND cf.grupo = h.grupo
+        LEFT JOIN asistencia s ON s.alumno_id = m.alumno_id AND s.horario_id = m.horario_id AND s.fecha = cf.fecha
+        LEFT JOIN resumen_asistencia r ON r.alumno_id = m.alumno_id AND r.horario_id = m.horario_id
+        WHERE h.ciclo_id = ?
+        GROUP BY m.id
+        ORDER BY h.hora_inicio, h.grupo, h.nivel_salon, a.apellido, a.nombre
+    """, (ciclo_id,)
+
+def reporte_recuperaciones(ciclo_id):
+    return """
+        SELECT c.nombre AS ciclo, h.nivel_salon AS nivel, COUNT(*) AS justificadas,
+               COUNT(r.id) AS agendadas, SUM(COALESCE(r.asistio, 0)) AS asistidas,
+               ROUND(100.0 * SUM(COALESCE(r.asistio, 0)) / COUNT(*), 1) AS tasa_pct
+        FROM asistencia s
+        JOIN horarios h ON h.id = s.horario_id
+        JOIN ciclos c ON c.id = h.ciclo_id
+        LEFT JOIN recuperaciones r ON r.alumno_id = s.alumno_id AND r.fecha_origen = s.fecha
+        WHERE s.estado = 'Justificado' AND h.ciclo_id = ?
+        GROUP BY h.nivel_salon
+        ORDER BY h.nivel_salon
+    """, (ciclo_id,)
+
+def reporte_incidentes(ciclo_id):
+    # Incidentes ocurridos entre el inicio del ciclo y el inicio del siguiente
+    return """
+        SELECT strftime('%Y-%m', i.fecha) AS mes, i.gravedad, COUNT(*) AS incidentes,
+               COUNT(DISTINCT i.alumno_id) AS alumnos
+        FROM incidentes i, ciclos c
+        WHERE c.id = ? AND i.fecha >= c.fecha_inicio
+          AND i.fecha < COALESCE((SELECT MIN(c2.fecha_inicio) FROM ciclos c2 WHERE c2.fecha_inicio > c.fecha_inicio), '9999-12-31')
+        GROUP BY mes, i.gravedad
+        ORDER BY mes, incidentes DESC
+    """, (ciclo_id,)
+
+def reporte_ocupacion(ciclo_id):
+    return """
+        SELECT h.grupo, h.hora_inicio, h.nivel_salon AS salon, h.capacidad, COUNT(m.id) AS matriculados,
+               h.capacidad - COUNT(m.id) AS libres,
+               ROUND(100.0 * COUNT(m.id) / NULLIF(h.capacidad, 0), 1) AS ocupacion_pct
+        FROM horarios h LEFT JOIN matriculas m ON m.horario_id = h.id
+        WHERE h.ciclo_id = ?
+        GROUP BY h.id
+        ORDER BY h.hora_inicio, h.grupo, h.nivel_salon
+    """, (ciclo_id,)
+
+REPORTES = {
+    "Matriz de asistencia": reporte_asistencia,
+    "Recuperaciones por nivel": reporte_recuperaciones,
+    "Incidentes por gravedad": reporte_incidentes,
+    "Ocupación por salón": reporte_ocupacion,
+}
+
+def bloques_consulta(query: str, params=(), pool=None, lote: int = REPORTE_LOTE) -> Iterator[pd.DataFrame]:
+    # DataFrames de hasta `lote` filas leídos del cursor con fetchmany.
+    # pool: PoolBD o ArchivoBD; explícito porque la descarga se genera en otro hilo, fuera del script.
+    with (pool or get_pool()).conexion() as conn:
+        c = conn.execute(query, params)
+        cols = [d[0] for d in c.description]
+        while True:
+            filas = c.fetchmany(lote)
+            if not filas: break
+            yield pd.DataFrame(filas, columns=cols)
+
+def exportar_csv(bloques, destino):
+    for i, df in enumerate(bloques):
+        destino.write(df.to_csv(index=False, header=(i == 0)).encode("utf-8"))
+
+def exportar_parquet(bloques, destino):
+    import pyarrow as pa            # viene con streamlit
+    import pyarrow.parquet as pq
+    writer = None
+    for df in bloques:
+        df = df.astype({col: "string" for col in df.columns if df[col].dtype == object})
+        tabla = pa.Table.from_pandas(df, preserve_index=False, schema=writer.schema if writer else None)
+        if writer is None: writer = pq.ParquetWriter(destino, tabla.schema)
+        writer.write_table(tabla)
+    if writer: writer.close()
+
+def exportar_xlsx(bloques, destino):
+    from openpyxl import Workbook   # modo write_only: escribe fila por fila
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Reporte")
+    for i, df in enumerate(bloques):
+        if i == 0: ws.append(list(df.columns))
+        for fila in df.itertuples(index=False): ws.append([None if pd.isna(v) else v for v in fila])
+    wb.save(destino)
+
+FORMATOS = {
+    "CSV": (exportar_csv, "csv", "text/csv"),
+    "Parquet": (exportar_parquet, "parquet", "application/octet-stream"),
+    "Excel": (exportar_xlsx, "xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+def generar_reporte(nombre: str, ciclo_id: int, formato: str, pool=None) -> bytes:
+    # Se exporta a un temporal (en disco si pasa de 8 MB) y se devuelven sus bytes:
+    # download_button no acepta objetos de archivo arbitrarios
+    exportar = FORMATOS[formato][0]
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as destino:
+        exportar(bloques_consulta(*REPORTES[nombre](ciclo_id), pool=pool), destino)
+        destino.seek(0)
+        return destino.read()
@@ -0,0 +1,12 @@
+import pytest
+
+from piscina import bd, esquema
+
+@pytest.fixture
+def base(tmp_path, monkeypatch):
+    # Base nueva por prueba, en un directorio temporal (DB_NAME y ARCHIVO_DB son relativos)
+    monkeypatch.chdir(tmp_path)
+    bd.get_pool.cache_clear(); esquema.init_db.cache_clear()
+    esquema.init_db()
+    yield tmp_path
+    bd.get_pool.cache_clear(); esquema.init_db.cache_clear()
@@ -0,0 +1,15 @@
+from piscina import bd, ciclos
+
+def test_perfil_no_cuenta_sentencias_del_escritor(base):
+    perfil = bd.get_perfil()
+    perfil.activo = True
+    try:
+        perfil.iniciar("Ciclos")
+        ciclos.crear_ciclo("C1", "2026-03-02")
+        rerun = perfil.local.rerun
+    finally:
+        perfil.activo = False
+        perfil.limpiar()
+    sqls = [q["sql"].split()[0] for q in rerun["consultas"]]
+    # Solo las del trabajo, no el SAVEPOINT / RELEASE / COMMIT con que el escritor lo envuelve
+    assert "INSERT" in sqls and not {"BEGIN", "SAVEPOINT", "RELEASE", "ROLLBACK", "COMMIT"} & set(sqls)
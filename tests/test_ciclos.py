@@ -0,0 +1,54 @@
+from piscina import asistencia, bd, ciclos, horarios, matriculas, recuperaciones
+
+LMV = "Lunes-Miércoles-Viernes"
+
+def salon(cid, hora="07:00-08:00"):
+    horarios.crear_salon(cid, LMV, hora, "Básico 0", 10)
+    return horarios.ocupacion_salones(cid, LMV, hora)[0].id
+
+def test_archivar_con_recuperaciones_entre_ciclos(base):
+    c1, c2 = ciclos.crear_ciclo("C1", "2026-03-02"), ciclos.crear_ciclo("C2", "2026-04-06")
+    h1, h2 = salon(c1), salon(c2)
+    a1 = matriculas.matricular_alumno_nuevo(h1, "Ana", "Pérez")
+    a2 = matriculas.matricular_alumno_nuevo(h2, "Luis", "Quispe")
+    a3 = matriculas.matricular_alumno_nuevo(h2, "Rosa", "Vega")
+    f1, f2 = ciclos.fechas_clase(c1, LMV), ciclos.fechas_clase(c2, LMV)
+    asistencia.guardar_asistencia(h1, [(a1, f1[-1], None, "Justificado")])
+    asistencia.guardar_asistencia(h2, [(a2, f2[0], None, "Justificado"), (a3, f2[0], None, "Justificado")])
+    # Falta de C1 recuperada en un salón de C2, y visitantes de C2 en un salón de C1 (uno asistió, otro no)
+    recuperaciones.agendar_recuperaciones([(a1, f1[-1], h2, f2[1]), (a2, f2[0], h1, f1[-2]), (a3, f2[0], h1, f1[-1])])
+    rid = next(v.id for v in recuperaciones.visitantes_salon(h1) if v.nombre == "Luis")
+    recuperaciones.marcar_visitantes([(1, rid, 0)])
+
+    ciclos.archivar_ciclo(c1)
+
+    archivo = bd.ArchivoBD()
+    with archivo.conexion() as conn:
+        recs = conn.execute("SELECT alumno_id, horario_destino_id FROM recuperaciones ORDER BY alumno_id").fetchall()
+        assert recs == [(a1, h2), (a2, h1), (a3, h1)]
+        assert {r[0] for r in conn.execute("SELECT id FROM alumnos")} == {a1, a2, a3}
+        assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+    # El ciclo del salón destino se copia como referencia, pero sigue vivo y no se lista como archivado
+    assert [c.id for c in ciclos.listar_ciclos(pool=archivo)] == [c1]
+    assert [c.id for c in ciclos.listar_ciclos()] == [c2]
+
+    # En la base viva, la recuperación asistida del alumno de C2 se conserva (sin salón destino) y
+    # sigue contando; la no asistida se borra y su falta vuelve a quedar pendiente
+    with bd.get_pool().conexion() as conn:
+        assert conn.execute("SELECT alumno_id, horario_destino_id, asistio FROM recuperaciones").fetchall() == [(a2, None, 1)]
+        assert conn.execute("SELECT recuperadas FROM resumen_asistencia WHERE alumno_id = ? AND horario_id = ?", (a2, h2)).fetchone() == (1,)
+        assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+    assert [(p.alumno_id, p.fecha) for p in recuperaciones.pendientes_recuperacion(10)] == [(a3, f2[0])]
+    assert [(r.nombre, r.asistio) for r in recuperaciones.calendario_recuperaciones()] == [("Luis", 1)]
+
+def test_feriado_solo_corre_ciclos_que_lo_abarcan(base):
+    c1, c2 = ciclos.crear_ciclo("C1", "2026-03-02"), ciclos.crear_ciclo("C2", "2026-06-01")
+    f1, f2 = ciclos.fechas_clase(c1, LMV), ciclos.fechas_clase(c2, LMV)
+    # Feriado cargado por fuera cuando C1 ya estaba cerrado: su calendario histórico no debe cambiar
+    bd.escribir(lambda c: c.execute("INSERT INTO feriados (fecha, motivo) VALUES (?, 'Antiguo')", (f1[0],)), "feriados").result()
+    ciclos.agregar_feriado(f2[3], "Feriado")
+    assert ciclos.fechas_clase(c1, LMV) == f1
+    nuevas = ciclos.fechas_clase(c2, LMV)
+    assert f2[3] not in nuevas and nuevas[:3] == f2[:3] and len(nuevas) == len(f2)
+    ciclos.quitar_feriado(f2[3])
+    assert ciclos.fechas_clase(c1, LMV) == f1 and ciclos.fechas_clase(c2, LMV) == f2
@@ -0,0 +1,57 @@
+import io
+
+import pytest
+
+from piscina import ciclos, horarios, importacion, matriculas
+
+@pytest.mark.parametrize("contenido", [b"", b"nombre\n", b"nombre\nana\nluis\n", b'nombre;apellido\n"ana;x\n'])
+def test_csv_ilegible_es_valueerror(base, contenido):
+    # La página muestra los ValueError como error; cualquier otra excepción la rompe
+    cid = ciclos.crear_ciclo("C1", "2026-03-02")
+    with pytest.raises(ValueError):
+        importacion.importar_alumnos(importacion.leer_archivo_alumnos(io.BytesIO(contenido), "alumnos.csv"), cid)
+
+def test_cupo_verificado_al_insertar(base):
+    cid = ciclos.crear_ciclo("C1", "2026-03-02")
+    horarios.crear_salon(cid, "Lunes-Miércoles-Viernes", "07:00-08:00", "Básico 0", 2)
+    hid = horarios.ocupacion_salones(cid)[0].id
+    csv = "nombre,apellido,telefono,dias,hora,nivel\nAna,Pérez,1,LMV,07:00,Básico 0\nLuis,Quispe,2,LMV,07:00,Básico 0\n"
+
+    def bloques():
+        yield from importacion.leer_archivo_alumnos(io.BytesIO(csv.encode()), "alumnos.csv")
+        # Matrícula de la recepción entre la validación y la inserción
+        matriculas.matricular_alumno_nuevo(hid, "Eva", "Rojas")
+
+    resumen, errores = importacion.importar_alumnos(bloques(), cid, confirmar=True)
+    assert resumen["matriculas"] == 1 and resumen["alumnos_nuevos"] == 1
+    assert errores == [(3, "Luis Quispe", "Salón lleno")]
+    assert horarios.ocupacion_salones(cid)[0].ocupados == 2
+
+def test_excel_por_bloques(base):
+    from openpyxl import Workbook
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Nombre", "Apellido", "Teléfono", "Días", "Hora", "Nivel"])
+    for i in range(5): ws.append([f"Ana{i}", "Pérez", 900000000 + i, "LMV", "07:00", "Básico 0"])
+    ws.append(["Luis", "Rojas"])   # fila incompleta
+    archivo = io.BytesIO(); wb.save(archivo); archivo.seek(0)
+    bloques = list(importacion.leer_archivo_alumnos(archivo, "alumnos.xlsx", chunksize=2))
+    assert [len(b) for b in bloques] == [2, 2, 2]
+    assert bloques[0]["Teléfono"][0] == "900000000"
+    assert bloques[2]["Nivel"].isna().tolist() == [False, True]
+
+def test_excel_con_celdas_de_hora_y_fecha(base):
+    from datetime import datetime, time
+    from openpyxl import Workbook
+    cid = ciclos.crear_ciclo("C1", "2026-03-02")
+    horarios.crear_salon(cid, "Lunes-Miércoles-Viernes", "07:00-08:00", "Básico 0", 5)
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["nombre", "apellido", "dias", "hora", "nivel", "condicion"])
+    ws.append(["Ana", "Pérez", "LMV", time(7, 0), "Básico 0", datetime(2026, 3, 2)])   # celdas tipadas, no texto
+    archivo = io.BytesIO(); wb.save(archivo); archivo.seek(0)
+    bloques = list(importacion.leer_archivo_alumnos(archivo, "alumnos.xlsx"))
+    assert bloques[0]["hora"][0] == "07:00" and bloques[0]["condicion"][0] == "2026-03-02"
+    resumen, errores = importacion.importar_alumnos(bloques, cid, confirmar=True)
+    assert errores == [] and resumen["matriculas"] == 1
+    assert horarios.ocupacion_salones(cid)[0].ocupados == 1
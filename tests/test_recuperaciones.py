@@ -0,0 +1,29 @@
+from datetime import date
+
+from piscina import asistencia, bd, ciclos, horarios, matriculas, recuperaciones
+
+LMV = "Lunes-Miércoles-Viernes"
+
+def test_guardar_plan_verifica_cupos(base):
+    cid = ciclos.crear_ciclo("C1", "2026-03-02")
+    horarios.crear_salon(cid, LMV, "07:00-08:00", "Básico 0", 5)
+    horarios.crear_salon(cid, LMV, "08:00-09:00", "Básico 0", 2)
+    h1, h2 = [s.id for s in horarios.ocupacion_salones(cid)]
+    matriculas.matricular_alumno_nuevo(h2, "Eva", "Rojas")   # un solo cupo libre por día en h2
+    ana, luis, rosa = (matriculas.matricular_alumno_nuevo(h1, n, "Pérez") for n in ("Ana", "Luis", "Rosa"))
+    f = ciclos.fechas_clase(cid, LMV)
+    asistencia.guardar_asistencia(h1, [(a, f[0], None, "Justificado") for a in (ana, luis, rosa)])
+
+    plan, _ = recuperaciones.planificar_recuperaciones(horizonte=30, hoy=date(2026, 3, 2))
+    plan = [(p.alumno_id, p.fecha_origen, p.horario_id, p.fecha_destino) for p in plan if p.alumno_id != rosa]
+    assert plan == [(ana, f[0], h2, f[1]), (luis, f[0], h2, f[2])]
+    # Otra sesión ocupa el cupo de f[1] entre la vista previa y la confirmación
+    assert recuperaciones.agendar_recuperaciones([(rosa, f[0], h2, f[1])]) == (1, [])
+
+    n, rechazadas = recuperaciones.agendar_recuperaciones(plan)
+    assert n == 1 and rechazadas == [(plan[0], "Salón lleno ese día")]
+    with bd.get_pool().conexion() as c:
+        ocupados = dict(c.execute("SELECT fecha_destino, COUNT(*) FROM recuperaciones WHERE horario_destino_id = ? GROUP BY 1", (h2,)))
+    assert ocupados == {f[1]: 1, f[2]: 1}
+    # Confirmar dos veces no duplica
+    assert recuperaciones.agendar_recuperaciones(plan[1:]) == (0, [(plan[1], "Ya tiene recuperación agendada")])
@@ -0,0 +1,21 @@
+import io
+
+import pandas as pd
+import pytest
+
+from piscina import asistencia, ciclos, horarios, matriculas, reportes
+
+LEER = {"CSV": pd.read_csv, "Parquet": pd.read_parquet, "Excel": pd.read_excel}
+
+@pytest.mark.parametrize("formato", list(reportes.FORMATOS))
+def test_generar_reporte_devuelve_bytes(base, formato):
+    cid = ciclos.crear_ciclo("C1", "2026-03-02")
+    horarios.crear_salon(cid, "Lunes-Miércoles-Viernes", "07:00-08:00", "Básico 0", 10)
+    hid = horarios.ocupacion_salones(cid)[0].id
+    aid = matriculas.matricular_alumno_nuevo(hid, "Ana", "Pérez")
+    asistencia.guardar_asistencia(hid, [(aid, ciclos.fechas_clase(cid, "Lunes-Miércoles-Viernes")[0], None, "Presente")])
+    # download_button solo acepta str, bytes o ciertos objetos de archivo
+    data = reportes.generar_reporte("Matriz de asistencia", cid, formato)
+    assert isinstance(data, bytes)
+    df = LEER[formato](io.BytesIO(data))
+    assert len(df) == 1 and df["presentes"][0] == 1